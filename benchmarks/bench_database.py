@@ -0,0 +1,262 @@
+"""Microbenchmarks for the public ``bot.database`` API.
+
+Seeds a temporary SQLite database and times every public function, writing
+the results as JSON so runs can be compared::
+
+    python benchmarks/bench_database.py --users 100000 --output run.json
+    python benchmarks/bench_database.py --compare benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+
+from sqlalchemy import insert
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--missions-per-user", type=int, default=3)
+    parser.add_argument("--purchases", type=int, default=20_000)
+    parser.add_argument("--rewards", type=int, default=20)
+    parser.add_argument("--activity-weeks", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per function")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    return parser.parse_args(argv)
+
+
+def insert_chunked(conn, model, rows, chunk=50_000):
+    """executemany ``rows`` into ``model`` without materialising them all."""
+    rows = iter(rows)
+    while batch := list(islice(rows, chunk)):
+        conn.execute(insert(model), batch)
+
+
+def seed(db, args, rng):
+    """Bulk load users, missions, rewards, purchases and weekly activity."""
+    now = datetime.utcnow()
+    this_week = db._week_start(now.date())
+    with db.init_db().begin() as conn:
+        insert_chunked(
+            conn,
+            db.User,
+            ({"id": uid, "points": rng.randint(0, 500)} for uid in range(1, args.users + 1)),
+        )
+        mission_types = ["message", "daily", "weekly", "hard"]
+        insert_chunked(
+            conn,
+            db.MissionTemplate,
+            (
+                {
+                    "id": template_id,
+                    "description": "Envía un mensaje en el canal",
+                    "points": 2,
+                    "type": mission_type,
+                    "goal": 5,
+                    "reward": 20 if mission_type == "hard" else 10,
+                }
+                for template_id, mission_type in enumerate(mission_types, start=1)
+            ),
+        )
+        insert_chunked(
+            conn,
+            db.Mission,
+            (
+                {
+                    "user_id": uid,
+                    "template_id": rng.randint(1, len(mission_types)),
+                    "progress": 0,
+                    "expires_at": now + timedelta(hours=rng.randint(-48, 24 * 7)),
+                    "warning_sent": False,
+                }
+                for uid in range(1, args.users + 1)
+                for _ in range(args.missions_per_user)
+            ),
+        )
+        insert_chunked(
+            conn,
+            db.Reward,
+            (
+                {"name": f"Reward {i}", "description": "bench", "cost": 10 * i}
+                for i in range(1, args.rewards + 1)
+            ),
+        )
+        insert_chunked(
+            conn,
+            db.Purchase,
+            (
+                {
+                    "user_id": rng.randint(1, args.users),
+                    "reward_id": rng.randint(1, args.rewards),
+                    "purchased_at": now - timedelta(days=rng.randint(0, 365)),
+                }
+                for _ in range(args.purchases)
+            ),
+        )
+        insert_chunked(
+            conn,
+            db.WeeklyActivity,
+            (
+                {
+                    "user_id": uid,
+                    "week_start": this_week - timedelta(weeks=week),
+                    "message_count": rng.randint(1, 200),
+                }
+                for week in range(args.activity_weeks)
+                for uid in range(1, args.users + 1)
+                if rng.random() < 0.5
+            ),
+        )
+    # purchases were bulk loaded, so their monthly rollups are built afterwards
+    db.rebuild_monthly_rollups()
+
+
+def time_call(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - began) * 1000)
+    return {
+        "runs": repeat,
+        "min_ms": round(min(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+    }
+
+
+def benchmarks(db, args, rng):
+    """Return ``(name, callable, repeat)`` for every benchmarked function."""
+    users = args.users
+    today = datetime.utcnow().date()
+    last_month = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+    def any_user():
+        return rng.randint(1, users)
+
+    def progress():
+        mission = db.assign_mission(any_user(), "bench", 1, days_valid=1, goal=2)
+        db.update_mission_progress(mission.user_id, mission.id)
+
+    def complete():
+        mission = db.assign_mission(any_user(), "bench", 1, days_valid=1)
+        db.complete_mission(mission.user_id, mission.id)
+
+    def record_messages():
+        for _ in range(1000):
+            db.record_user_message(any_user())
+        db.flush_activity_buffer()
+
+    near = [m.id for m in db.get_missions_near_expiry(24)][:500]
+    repeat = args.repeat
+    return [
+        ("get_or_create_user", lambda: db.get_or_create_user(any_user()), repeat),
+        ("get_or_create_user_new", lambda: db.get_or_create_user(users + rng.randint(1, 10**9)), repeat),
+        ("assign_mission", lambda: db.assign_mission(any_user(), "bench", 1, days_valid=1), repeat),
+        ("update_mission_progress", progress, repeat),
+        ("complete_mission", complete, repeat),
+        ("get_active_missions", lambda: db.get_active_missions(any_user()), repeat),
+        ("get_user_snapshot", lambda: db.get_user_snapshot(any_user()), repeat),
+        ("get_weekly_mission", lambda: db.get_weekly_mission(any_user()), repeat),
+        ("reset_missions", lambda: db.reset_missions(any_user()), repeat),
+        ("record_user_message_x1000", record_messages, max(1, repeat // 4)),
+        ("get_user_weekly_stat", lambda: db.get_user_weekly_stat(any_user()), repeat),
+        ("get_weekly_activity", lambda: db.get_weekly_activity(5), repeat),
+        ("get_top_users", lambda: db.get_top_users(10), repeat),
+        ("get_user_points", db.get_user_points, max(1, repeat // 4)),
+        ("get_all_users", db.get_all_users, max(1, repeat // 4)),
+        ("award_achievement", lambda: db.award_achievement(any_user(), "Bench", "bench"), repeat),
+        ("get_user_achievements", lambda: db.get_user_achievements(any_user()), repeat),
+        ("add_reward", lambda: db.add_reward("Bench", "bench", 10), repeat),
+        ("get_rewards", db.get_rewards, repeat),
+        ("redeem_reward", lambda: db.redeem_reward(any_user(), 1), repeat),
+        ("get_user_purchases", lambda: db.get_user_purchases(any_user()), repeat),
+        ("get_purchase_page", lambda: db.get_purchase_page(any_user()), repeat),
+        ("get_monthly_purchase_summary", lambda: db.get_monthly_purchase_summary(last_month), repeat),
+        ("get_missions_near_expiry", lambda: db.get_missions_near_expiry(24), max(1, repeat // 4)),
+        ("mark_warnings_sent_x500", lambda: db.mark_warnings_sent(near), max(1, repeat // 4)),
+        ("get_points_ledger", lambda: db.get_points_ledger(any_user()), repeat),
+        ("audit_points", db.audit_points, max(1, repeat // 4)),
+        ("reward_top_weekly_users", lambda: db.reward_top_weekly_users(today), repeat),
+        ("assign_daily_missions", lambda: db.assign_daily_missions("bench", 5, goal=3), 2),
+        ("assign_weekly_missions", lambda: db.assign_weekly_missions("bench", 20, goal=10), 2),
+        ("rollover_weekly_activity", db.rollover_weekly_activity, 2),
+        ("remove_expired_missions", db.remove_expired_missions, 2),
+    ]
+
+
+def compare(results, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text())["results"]
+    print(f"{'function':32} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:32} {'-':>10} {stats['median_ms']:>10.3f}")
+            continue
+        ratio = stats["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        print(f"{name:32} {base['median_ms']:>10.3f} {stats['median_ms']:>10.3f} {ratio:>7.2f}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="bot-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+
+    from bot import database as db
+
+    try:
+        began = time.perf_counter()
+        seed(db, args, rng)
+        seed_seconds = time.perf_counter() - began
+
+        results = {}
+        for name, func, repeat in benchmarks(db, args, rng):
+            results[name] = time_call(func, repeat)
+            print(f"{name:32} {results[name]['median_ms']:>10.3f} ms", file=sys.stderr)
+    finally:
+        db.engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "users": args.users,
+            "missions_per_user": args.missions_per_user,
+            "purchases": args.purchases,
+            "rewards": args.rewards,
+            "activity_weeks": args.activity_weeks,
+            "seed_seconds": round(seed_seconds, 3),
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        compare(results, args.compare)
+    if not args.output and not args.compare:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,30 @@
 from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command, BaseFilter
 from aiogram.types import Message
 
 from datetime import datetime, timedelta
+import csv
+import io
+import logging
+import tempfile
+import time
 
 from bot.config import settings
 from bot.database import (
+    run_db,
     assign_mission,
     award_achievement,
     add_reward,
+    import_missions,
     get_monthly_purchase_summary,
+    rebuild_monthly_rollups,
+    user_cache,
 )
+from bot.admin.importer import read_mission_rows
+from bot.ordering import ordering
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
@@ -35,10 +49,89 @@ async def create_mission(message: Message) -> None:
     except Exception:
         await message.answer("Uso: /createmission user_id|descripcion|puntos|dias")
         return
-    assign_mission(user_id, desc, points, days_valid=days)
+    await run_db(assign_mission, user_id, desc, points, days_valid=days)
     await message.answer("Misi\u00f3n creada")
 
 
+IMPORT_BATCH_SIZE = 1000  # missions per executemany and transaction
+IMPORT_PROGRESS_INTERVAL = 2.0  # seconds between status edits
+IMPORT_MAX_REPORTED_ERRORS = 20
+
+
+async def _edit_status(status: Message, text: str) -> None:
+    try:
+        await status.edit_text(text)
+    except TelegramBadRequest:
+        # unchanged text or a deleted status message
+        pass
+
+
+@router.message(Command("importmissions"), AdminFilter())
+async def import_missions_command(message: Message) -> None:
+    """Create missions in bulk from an uploaded CSV/TSV document."""
+    if not message.document:
+        await message.answer(
+            "Uso: env\u00eda un archivo CSV/TSV con el comentario /importmissions\n"
+            "Columnas: user_id, descripcion, puntos, dias[, tipo, meta]"
+        )
+        return
+    status = await message.answer("Importando misiones...")
+    created = processed = 0
+    errors: list[str] = []
+    error_count = 0
+    last_edit = time.monotonic()
+    batch: list[dict] = []
+
+    async def flush(last_line: int) -> None:
+        nonlocal created, error_count
+        if not batch:
+            return
+        try:
+            created += await run_db(import_missions, batch)
+        except Exception as exc:
+            # rows of earlier batches stay imported; report this one as failed
+            logger.exception("Mission import batch failed")
+            error_count += len(batch)
+            errors.append(
+                f"Lote de {len(batch)} filas hasta la l\u00ednea {last_line} no importado: {exc}"
+            )
+        batch.clear()
+
+    line = 0
+    with tempfile.TemporaryFile() as raw:
+        await message.bot.download(message.document, destination=raw)
+        raw.seek(0)
+        stream = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        try:
+            for line, row in read_mission_rows(stream):
+                processed += 1
+                if isinstance(row, str):
+                    error_count += 1
+                    if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+                        errors.append(f"L\u00ednea {line}: {row}")
+                    continue
+                batch.append(row)
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    await flush(line)
+                    if time.monotonic() - last_edit >= IMPORT_PROGRESS_INTERVAL:
+                        last_edit = time.monotonic()
+                        await _edit_status(
+                            status,
+                            f"Importando misiones... {created} creadas, "
+                            f"{error_count} con errores",
+                        )
+        except (UnicodeDecodeError, csv.Error) as exc:
+            error_count += 1
+            errors.append(f"Archivo ilegible tras {processed} filas: {exc}")
+        await flush(line)
+    text = f"Importaci\u00f3n terminada: {created} misiones creadas, {error_count} filas con errores"
+    if errors:
+        text += "\n" + "\n".join(errors)
+        if error_count > len(errors):
+            text += f"\n... y {error_count - len(errors)} m\u00e1s"
+    await _edit_status(status, text)
+
+
 @router.message(Command("award"), AdminFilter())
 async def award_command(message: Message) -> None:
     """Award an achievement to a user."""
@@ -49,7 +142,7 @@ async def award_command(message: Message) -> None:
     except Exception:
         await message.answer("Uso: /award user_id|nombre|descripcion")
         return
-    award_achievement(user_id, name, desc)
+    await run_db(award_achievement, user_id, name, desc)
     await message.answer("Logro otorgado")
 
 
@@ -63,7 +156,7 @@ async def add_reward_command(message: Message) -> None:
     except Exception:
         await message.answer("Uso: /addreward nombre|descripcion|costo")
         return
-    add_reward(name, desc, cost)
+    await run_db(add_reward, name, desc, cost)
     await message.answer("Recompensa agregada")
 
 
@@ -81,10 +174,51 @@ async def monthly_purchases_command(message: Message) -> None:
         first_day_current = datetime.utcnow().date().replace(day=1)
         month = (first_day_current - timedelta(days=1)).replace(day=1)
 
-    summary = get_monthly_purchase_summary(month)
+    summary = await run_db(get_monthly_purchase_summary, month)
     if not summary:
         await message.answer("Sin compras registradas")
         return
 
     lines = [f"{reward.name if reward else rid}: {count}" for reward, count in summary]
     await message.answer(f"Resumen de compras {month:%Y-%m}:\n" + "\n".join(lines))
+
+
+@router.message(Command("rebuildrollups"), AdminFilter())
+async def rebuild_rollups_command(message: Message) -> None:
+    """Recompute monthly purchase rollups from the purchase history."""
+    parts = message.text.split(maxsplit=1)
+    month = None
+    if len(parts) > 1:
+        try:
+            month = datetime.strptime(parts[1], "%Y-%m").date()
+        except ValueError:
+            await message.answer("Uso: /rebuildrollups [YYYY-MM]")
+            return
+    rebuilt = await run_db(rebuild_monthly_rollups, month)
+    await message.answer(f"Res\u00famenes mensuales recalculados: {rebuilt}")
+
+
+@router.message(Command("cachestats"), AdminFilter())
+async def cache_stats_command(message: Message) -> None:
+    """Show hit/miss counters of the user cache."""
+    stats = user_cache.stats()
+    await message.answer(
+        f"Cach\u00e9 de usuarios: {stats['size']}/{stats['maxsize']}\n"
+        f"Aciertos: {stats['hits']} Fallos: {stats['misses']} "
+        f"Desalojos: {stats['evictions']} ({stats['hit_ratio']:.0%} aciertos)"
+    )
+
+
+@router.message(Command("queuestats"), AdminFilter())
+async def queue_stats_command(message: Message) -> None:
+    """Show per-user update queue depths."""
+    stats = ordering.stats()
+    text = (
+        f"Actualizaciones en curso: {stats['running']}/{stats['limit']}\n"
+        f"En cola: {stats['queued']} Usuarios: {stats['users']} "
+        f"Profundidad m\u00e1xima: {stats['peak_depth']}"
+    )
+    deepest = [f"{user_id}: {depth}" for user_id, depth in stats["deepest"] if depth > 1]
+    if deepest:
+        text += "\nColas m\u00e1s largas:\n" + "\n".join(deepest)
+    await message.answer(text)
@@ -0,0 +1,85 @@
+"""Streaming parser for bulk mission imports.
+
+Rows are read one at a time from a CSV or TSV text stream, so arbitrarily
+large uploads are never held in memory. Columns, with an optional header
+row, are ``user_id, descripcion, puntos, dias[, tipo, meta]``; ``dias`` may
+be empty for missions that never expire.
+"""
+
+import csv
+import itertools
+from datetime import datetime, timedelta
+from typing import Iterator, TextIO
+
+COLUMNS = ("user_id", "description", "points", "days", "type", "goal")
+REQUIRED_COLUMNS = 4
+MAX_DESCRIPTION_LENGTH = 255
+MAX_INTEGER = 2**63 - 1  # SQLite INTEGER
+
+
+def _delimiter(first_line: str) -> str:
+    if "\t" in first_line:
+        return "\t"
+    if ";" in first_line and "," not in first_line:
+        return ";"
+    return ","
+
+
+def _parse_row(cells: list[str], now: datetime) -> dict:
+    cells = [cell.strip() for cell in cells]
+    if len(cells) < REQUIRED_COLUMNS:
+        raise ValueError(f"se esperaban al menos {REQUIRED_COLUMNS} columnas")
+    values = dict(itertools.zip_longest(COLUMNS, cells[: len(COLUMNS)], fillvalue=""))
+    try:
+        user_id = int(values["user_id"])
+    except ValueError:
+        raise ValueError("user_id inv\u00e1lido") from None
+    description = values["description"]
+    if not description or len(description) > MAX_DESCRIPTION_LENGTH:
+        raise ValueError("descripci\u00f3n vac\u00eda o demasiado larga")
+    try:
+        points = int(values["points"])
+        days = int(values["days"]) if values["days"] else None
+        goal = int(values["goal"]) if values["goal"] else 1
+    except ValueError:
+        raise ValueError("puntos, d\u00edas y meta deben ser n\u00fameros enteros") from None
+    if not 0 < user_id <= MAX_INTEGER or points < 0 or goal < 1 or (days is not None and days < 0):
+        raise ValueError("valores fuera de rango")
+    # the template stores the reward, up to points * goal * 2 for hard missions
+    if points * goal * 2 > MAX_INTEGER:
+        raise ValueError("puntos o meta demasiado grandes")
+    expires_at = None
+    if days is not None:
+        try:
+            expires_at = now + timedelta(days=days)
+        except OverflowError:
+            raise ValueError("d\u00edas fuera de rango") from None
+    return {
+        "user_id": user_id,
+        "description": description,
+        "points": points,
+        "type": values["type"] or "generic",
+        "goal": goal,
+        "expires_at": expires_at,
+    }
+
+
+def read_mission_rows(stream: TextIO) -> Iterator[tuple[int, dict | str]]:
+    """Yield ``(line, row)`` for valid rows and ``(line, error)`` for invalid ones."""
+    first_line = stream.readline()
+    if not first_line:
+        return
+    reader = csv.reader(
+        itertools.chain([first_line], stream), delimiter=_delimiter(first_line)
+    )
+    now = datetime.utcnow()
+    for cells in reader:
+        line = reader.line_num
+        if not any(cell.strip() for cell in cells):
+            continue
+        if line == 1 and cells[0].strip().lower() == "user_id":
+            continue
+        try:
+            yield line, _parse_row(cells, now)
+        except ValueError as exc:
+            yield line, str(exc)
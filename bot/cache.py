@@ -0,0 +1,118 @@
+"""Small thread-safe LRU cache with per-entry time to live."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry.
+
+    Entries older than ``ttl`` seconds are treated as missing. Hit, miss
+    and eviction counters are kept so the size can be tuned.
+
+    Values loaded from a slower store should go through :meth:`reserve` and
+    :meth:`fill`: any write to the key in between cancels the fill, so a
+    value read before a concurrent change is never cached.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._fills: dict[Hashable, object] = {}  # key -> token of the pending fill
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.monotonic() - stored_at > self.ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or self._expired(entry[0]):
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._fills.pop(key, None)
+            self._store(key, value)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def reserve(self, key: Hashable) -> object:
+        """Start loading ``key``; pass the returned token to :meth:`fill`."""
+        token = object()
+        with self._lock:
+            if len(self._fills) >= max(self.maxsize, 1):
+                # abandoned reservations only cost a skipped fill
+                self._fills.clear()
+            self._fills[key] = token
+        return token
+
+    def fill(self, key: Hashable, token: object, value: Any) -> bool:
+        """Cache a loaded value unless the key was written since :meth:`reserve`."""
+        with self._lock:
+            if self._fills.get(key) is not token:
+                return False
+            del self._fills[key]
+            self._store(key, value)
+            return True
+
+    def replace(self, key: Hashable, value: Any) -> None:
+        """Update an entry only if it is already cached."""
+        with self._lock:
+            self._fills.pop(key, None)
+            if key in self._data:
+                self._data[key] = (time.monotonic(), value)
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value without touching recency or counters."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or self._expired(entry[0]):
+                return default
+            return entry[1]
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._fills.pop(key, None)
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._fills.clear()
+            self._data.clear()
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
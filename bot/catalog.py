@@ -0,0 +1,64 @@
+"""Versioned in-memory copy of the reward catalog.
+
+The catalog only changes through admin commands, so it is loaded once and
+reused until ``bot.database`` reports a new catalog version. A short TTL
+bounds staleness when another process changed the rewards.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+from bot.database import Reward, get_rewards, reward_catalog_version
+
+CATALOG_TTL = 60.0  # seconds
+
+
+@dataclass(frozen=True)
+class RewardCatalog:
+    version: int
+    loaded_at: float
+    rewards: dict[int, Reward]
+    store_text: str | None  # None when the store is empty
+
+
+_catalog: RewardCatalog | None = None
+_lock = threading.Lock()
+
+
+def _render_store(rewards: list[Reward]) -> str | None:
+    if not rewards:
+        return None
+    lines = [f"{r.id}. {r.name} - {r.cost} pts" for r in rewards]
+    return "Tienda:\n" + "\n".join(lines)
+
+
+def cached_catalog() -> RewardCatalog | None:
+    """Return the catalog if the cached copy is still current."""
+    catalog = _catalog
+    if (
+        catalog is not None
+        and catalog.version == reward_catalog_version()
+        and time.monotonic() - catalog.loaded_at < CATALOG_TTL
+    ):
+        return catalog
+    return None
+
+
+def load_catalog() -> RewardCatalog:
+    """Return the current catalog, reading the Reward table if it is stale."""
+    global _catalog
+    with _lock:
+        catalog = cached_catalog()
+        if catalog is not None:
+            return catalog
+        version = reward_catalog_version()
+        rewards = get_rewards()
+        catalog = RewardCatalog(
+            version=version,
+            loaded_at=time.monotonic(),
+            rewards={r.id: r for r in rewards},
+            store_text=_render_store(rewards),
+        )
+        _catalog = catalog
+        return catalog
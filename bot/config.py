@@ -14,6 +14,41 @@ class Settings:
         ]
     )
     notify_channel_id: int = int(os.getenv("NOTIFY_CHANNEL_ID", "0"))
+    database_url: str = os.getenv("DATABASE_URL", "sqlite:///database.db")
+    db_workers: int = int(os.getenv("DB_WORKERS", "4"))
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    sqlite_busy_timeout: int = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # ms
+    sqlite_mmap_size: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    sqlite_cache_size: int = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # KiB if negative
+    user_cache_size: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    # each worker caches users on its own; changes made by another worker
+    # show up here only once the snapshot expires
+    user_cache_ttl: float = float(os.getenv("USER_CACHE_TTL", "30"))  # seconds
+    template_cache_size: int = int(os.getenv("TEMPLATE_CACHE_SIZE", "10000"))
+    delivery_workers: int = int(os.getenv("DELIVERY_WORKERS", "8"))
+    delivery_rate: float = float(os.getenv("DELIVERY_RATE", "30"))  # messages/s
+    delivery_drain_timeout: float = float(os.getenv("DELIVERY_DRAIN_TIMEOUT", "10"))  # seconds
+    update_concurrency: int = int(os.getenv("UPDATE_CONCURRENCY", "64"))
+    metrics_host: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    metrics_port: int = int(os.getenv("METRICS_PORT", "0"))  # 0 disables /metrics
+    query_budget: int = int(os.getenv("QUERY_BUDGET", "20"))  # statements per handler
+    query_sample_rate: float = float(os.getenv("QUERY_SAMPLE_RATE", "0.01"))
+    # rebuild the ranking from the database so every worker sees all changes
+    ranking_refresh_interval: float = float(os.getenv("RANKING_REFRESH_INTERVAL", "60"))  # 0 disables
+    lease_ttl: float = float(os.getenv("LEASE_TTL", "30"))  # seconds
+    activity_retention_weeks: int = int(os.getenv("ACTIVITY_RETENTION_WEEKS", "0"))
+    # polling is used unless a public webhook URL is configured
+    webhook_url: str = os.getenv("WEBHOOK_URL", "")
+    webhook_path: str = os.getenv("WEBHOOK_PATH", "/webhook")
+    webhook_secret: str = os.getenv("WEBHOOK_SECRET", "")
+    webhook_host: str = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    webhook_port: int = int(os.getenv("PORT", "8080"))
+    webhook_max_in_flight: int = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "100"))
+    webhook_max_per_user: int = int(os.getenv("WEBHOOK_MAX_PER_USER", "4"))
+    webhook_drain_timeout: float = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))  # seconds
+    activity_archive_top_n: int = int(os.getenv("ACTIVITY_ARCHIVE_TOP_N", "10"))
 
 
 settings = Settings()
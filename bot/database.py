@@ -1,31 +1,131 @@
 from sqlmodel import SQLModel, Field, create_engine, Session, select
-from typing import Optional, List
+from sqlalchemy import (
+    Index,
+    delete,
+    event,
+    exists,
+    func,
+    insert,
+    literal,
+    tuple_,
+    update,
+)
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Callable, Optional, List
 from datetime import datetime, timedelta, date
-
-engine = create_engine("sqlite:///database.db")
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+
+from bot.cache import LRUCache
+from bot.config import settings
+from bot.migrations import run_migrations
+from bot.ranking import ranking
+
+
+def _create_engine(url: str) -> Engine:
+    """Create the engine, tuning the pool and SQLite pragmas from settings."""
+    parsed = make_url(url)
+    in_memory = parsed.get_backend_name() == "sqlite" and parsed.database in (
+        None,
+        "",
+        ":memory:",
+    )
+    pool_options = {}
+    if not in_memory:
+        pool_options = {
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+        }
+    new_engine = create_engine(parsed, **pool_options)
+    if parsed.get_backend_name() == "sqlite":
+        event.listen(new_engine, "connect", _set_sqlite_pragmas)
+    return new_engine
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers proceed while a writer commits
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+# Created by init_db on first use so importing this module has no side effects.
+engine: Engine | None = None
+_init_lock = threading.Lock()
+
+# Blocking database calls made from handlers run on this bounded pool so the
+# event loop keeps processing updates. Each worker checks out its own pooled
+# connection.
+DB_WORKERS = settings.db_workers
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
 
 
 class User(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
     points: int = 0
     level: int = 1
-    badges: str = ""  # comma separated badges
+    badge_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
 
 
-class Mission(SQLModel, table=True):
+class MissionTemplate(SQLModel, table=True):
+    """Shared definition of a mission; per-user rows only track progress."""
+
+    __table_args__ = (
+        Index(
+            "ux_missiontemplate_definition",
+            "type",
+            "description",
+            "points",
+            "goal",
+            unique=True,
+        ),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
-    user_id: int | None = Field(default=None, foreign_key="user.id")
     description: str
     points: int
     type: str = "generic"
     goal: int = 1
+    reward: int = 0  # calculate_reward() of this definition
+
+
+class Mission(SQLModel, table=True):
+    """A user's instance of a mission template."""
+
+    __table_args__ = (
+        # backs the "already has this mission" anti-join of the bulk assigners
+        # and, through its leading column, every per-user mission lookup
+        Index("ix_mission_user_template_expires", "user_id", "template_id", "expires_at"),
+        Index("ix_mission_warning_expires", "warning_sent", "expires_at"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    user_id: int | None = Field(default=None, foreign_key="user.id")
+    template_id: int = Field(foreign_key="missiontemplate.id")
     progress: int = 0
-    expires_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = Field(default=None, index=True)
     warning_sent: bool = False
-    created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class Achievement(SQLModel, table=True):
+    """Badge earned by a user; each badge name is awarded at most once."""
+
+    __table_args__ = (
+        Index("ux_achievement_user_name", "user_id", "name", unique=True),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     name: str
@@ -45,47 +145,365 @@ class Reward(SQLModel, table=True):
 class Purchase(SQLModel, table=True):
     """Log of rewards purchased by users."""
 
+    __table_args__ = (
+        # keyset pagination of a user's history
+        Index("ix_purchase_user_time", "user_id", "purchased_at", "id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     reward_id: int = Field(foreign_key="reward.id")
-    purchased_at: datetime = Field(default_factory=datetime.utcnow)
+    purchased_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class MonthlyPurchaseRollup(SQLModel, table=True):
+    """Purchases per reward and calendar month, kept current by redeem_reward."""
+
+    month: datetime = Field(primary_key=True)  # first day of the month
+    reward_id: int = Field(foreign_key="reward.id", primary_key=True)
+    purchases: int = 0
+
+
+class PointsLedger(SQLModel, table=True):
+    """Append-only log of every change to a user's points."""
+
+    id: int | None = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    delta: int
+    balance: int  # user's points right after the change
+    reason: str  # "opening", "mission", "purchase" or "weekly_bonus"
+    ref_id: Optional[int] = None  # mission, purchase or other source id
+    created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class WeeklyActivity(SQLModel, table=True):
     """Tracks number of messages sent by a user each week."""
 
+    __table_args__ = (
+        Index("ux_weeklyactivity_user_week", "user_id", "week_start", unique=True),
+        Index("ix_weeklyactivity_week_count", "week_start", "message_count"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     week_start: datetime
     message_count: int = 0
 
 
-# create tables
-SQLModel.metadata.create_all(engine)
+class WeeklyActivityArchive(SQLModel, table=True):
+    """Frozen top of a finished week, kept after its raw rows are pruned."""
+
+    week_start: datetime = Field(primary_key=True)
+    rank: int = Field(primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    message_count: int
+
+
+class LifetimeActivity(SQLModel, table=True):
+    """Per-user message totals of every week that has been rolled over."""
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    message_count: int = 0
+    weeks_active: int = 0
+    last_week: datetime  # most recent week folded into the totals
+
+
+class Lease(SQLModel, table=True):
+    """Named lease that lets exactly one worker run a background job."""
+
+    name: str = Field(primary_key=True)
+    holder: str
+    expires_at: datetime
+
+
+class JobState(SQLModel, table=True):
+    """Last period a periodic background job has completed."""
+
+    name: str = Field(primary_key=True)
+    period: date
+
+
+def init_db(url: str | None = None) -> Engine:
+    """Create the engine, tables and pending migrations once.
+
+    Defaults to ``settings.database_url``; later calls return the same engine.
+    """
+    global engine
+    with _init_lock:
+        if engine is None:
+            new_engine = _create_engine(url or settings.database_url)
+            # create tables and upgrade existing databases
+            run_migrations(new_engine, SQLModel.metadata)
+            engine = new_engine
+    return engine
 
 
 def get_session():
-    return Session(engine)
+    return Session(engine or init_db())
+
+
+# Called with the ``expires_at`` of newly created missions so timers can be
+# armed without scanning the mission table.
+expiry_listeners: list[Callable[[datetime], None]] = []
 
 
-def calculate_reward(mission: Mission) -> int:
+def _notify_expiry(expires_at: datetime | None) -> None:
+    if expires_at is None:
+        return
+    for listener in expiry_listeners:
+        listener(expires_at)
+
+
+async def run_db(func, *args, **kwargs):
+    """Await a blocking database function without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    # copy the caller's context so context variables follow the call
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
+
+
+def calculate_reward(template: MissionTemplate) -> int:
     """Compute dynamic reward based on mission goal and type."""
-    base = mission.points * max(1, mission.goal)
-    if mission.type == "hard":
+    base = template.points * max(1, template.goal)
+    if template.type == "hard":
         base *= 2
     return base
 
 
+# Templates never change once written, so they are cached without a TTL,
+# both by id and by their (type, description, points, goal) definition.
+template_cache = LRUCache(settings.template_cache_size)
+
+
+TemplateKey = tuple[str, str, int, int]  # (type, description, points, goal)
+TEMPLATE_UPSERT_CHUNK_SIZE = 500  # rows per multi-row upsert
+
+
+def _resolve_templates(session: Session, keys) -> dict[TemplateKey, MissionTemplate]:
+    """Return the templates of the given definitions, creating missing ones.
+
+    Uncached definitions are written with one multi-row upsert per chunk in
+    the caller's transaction; call :func:`_cache_templates` after commit.
+    """
+    found: dict[TemplateKey, MissionTemplate] = {}
+    missing = []
+    for key in set(keys):
+        template = template_cache.get(key)
+        if template is None:
+            missing.append(key)
+        else:
+            found[key] = template
+    for i in range(0, len(missing), TEMPLATE_UPSERT_CHUNK_SIZE):
+        rows = []
+        for mission_type, description, points, goal in missing[i : i + TEMPLATE_UPSERT_CHUNK_SIZE]:
+            template = MissionTemplate(
+                description=description, points=points, type=mission_type, goal=goal
+            )
+            rows.append({**template.model_dump(exclude={"id"}), "reward": calculate_reward(template)})
+        statement = sqlite_insert(MissionTemplate).values(rows)
+        # a no-op update so RETURNING also yields rows that already exist
+        statement = statement.on_conflict_do_update(
+            index_elements=["type", "description", "points", "goal"],
+            set_={"reward": statement.excluded.reward},
+        ).returning(MissionTemplate)
+        for template in session.scalars(statement).all():
+            session.expunge(template)
+            found[(template.type, template.description, template.points, template.goal)] = template
+    return found
+
+
+def _cache_templates(templates) -> None:
+    for key, template in templates.items():
+        template_cache.set(key, template)
+        template_cache.set(template.id, template)
+
+
+def _template_for(description: str, points: int, mission_type: str, goal: int) -> MissionTemplate:
+    """Return the template for a definition, creating it on first use.
+
+    Runs in its own short transaction so callers can resolve templates before
+    they start writing missions.
+    """
+    key = (mission_type, description, points, goal)
+    template = template_cache.get(key)
+    if template is not None:
+        return template
+    with get_session() as session:
+        templates = _resolve_templates(session, [key])
+        session.commit()
+    _cache_templates(templates)
+    return templates[key]
+
+
+@dataclass
+class MissionView:
+    """Read-only mission data with its reward already computed."""
+
+    id: int
+    user_id: int
+    description: str
+    type: str
+    progress: int
+    goal: int
+    reward: int
+    expires_at: Optional[datetime]
+
+
+def _mission_view(mission: Mission, template: MissionTemplate) -> MissionView:
+    return MissionView(
+        id=mission.id,
+        user_id=mission.user_id,
+        description=template.description,
+        type=template.type,
+        progress=mission.progress,
+        goal=template.goal,
+        reward=template.reward,
+        expires_at=mission.expires_at,
+    )
+
+
+def _mission_views(session: Session, missions: List[Mission]) -> List[MissionView]:
+    templates = _templates(session, [m.template_id for m in missions])
+    return [_mission_view(m, templates[m.template_id]) for m in missions]
+
+
+def _templates(session: Session, template_ids) -> dict[int, MissionTemplate]:
+    """Look templates up by id, loading the uncached ones in one query."""
+    found = {}
+    missing = []
+    for template_id in set(template_ids):
+        template = template_cache.get(template_id)
+        if template is None:
+            missing.append(template_id)
+        else:
+            found[template_id] = template
+    if missing:
+        statement = select(MissionTemplate).where(MissionTemplate.id.in_(missing))
+        for template in session.exec(statement).all():
+            session.expunge(template)
+            template_cache.set(template.id, template)
+            found[template.id] = template
+    return found
+
+
+def _credit_points(
+    session: Session,
+    user_ids: List[int],
+    amount: int,
+    reason: str,
+    ref_id: int | None = None,
+) -> List[tuple[int, int, int]]:
+    """Atomically add points to users and log the change in the ledger.
+
+    Returns ``(user_id, points, level)`` for every user that was updated.
+    """
+    new_points = User.points + amount
+    statement = (
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(points=new_points, level=new_points // 100 + 1)
+        .returning(User.id, User.points, User.level)
+        .execution_options(synchronize_session=False)
+    )
+    rows = [tuple(row) for row in session.execute(statement)]
+    if rows:
+        # one executemany instead of an INSERT ... RETURNING per ORM object
+        now = datetime.utcnow()
+        session.execute(
+            insert(PointsLedger),
+            [
+                {
+                    "user_id": user_id,
+                    "delta": amount,
+                    "balance": points,
+                    "reason": reason,
+                    "ref_id": ref_id,
+                    "created_at": now,
+                }
+                for user_id, points, _ in rows
+            ],
+        )
+    return rows
+
+
+def _debit_points(
+    session: Session, user_id: int, amount: int, reason: str, ref_id: int | None = None
+) -> int | None:
+    """Atomically take points from a user if the balance covers it.
+
+    Returns the new balance, or None when the user lacks the points.
+    """
+    statement = (
+        update(User)
+        .where(User.id == user_id, User.points >= amount)
+        .values(points=User.points - amount)
+        .returning(User.points)
+        .execution_options(synchronize_session=False)
+    )
+    balance = session.execute(statement).scalar()
+    if balance is not None:
+        session.execute(
+            insert(PointsLedger).values(
+                user_id=user_id,
+                delta=-amount,
+                balance=balance,
+                reason=reason,
+                ref_id=ref_id,
+                created_at=datetime.utcnow(),
+            )
+        )
+    return balance
+
+
+# Snapshots of recently used users, kept in step by every function that
+# changes a User row in this process. Other workers' changes are only seen
+# after USER_CACHE_TTL.
+user_cache = LRUCache(settings.user_cache_size, settings.user_cache_ttl)
+
+
+def _user_snapshot(user: User, **changes) -> User:
+    return User(**{**user.model_dump(), **changes})
+
+
+def _points_changed(user_id: int, points: int, level: int | None = None) -> None:
+    """Propagate a committed points change to the in-memory views."""
+    ranking.update(user_id, points)
+    cached = user_cache.peek(user_id)
+    if cached is None:
+        # a load running in another thread may have read the old row
+        user_cache.discard(user_id)
+        return
+    changes = {"points": points}
+    if level is not None:
+        changes["level"] = level
+    user_cache.replace(user_id, _user_snapshot(cached, **changes))
+
+
+def _cached_user(user_id: int) -> User | None:
+    cached = user_cache.get(user_id)
+    return _user_snapshot(cached) if cached is not None else None
+
+
+def _load_or_create_user(session: Session, user_id: int) -> User:
+    token = user_cache.reserve(user_id)
+    statement = select(User).where(User.id == user_id)
+    user = session.exec(statement).first()
+    if not user:
+        user = User(id=user_id)
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        ranking.update(user.id, user.points)
+    user_cache.fill(user_id, token, _user_snapshot(user))
+    return user
+
+
 def get_or_create_user(user_id: int) -> User:
+    cached = _cached_user(user_id)
+    if cached is not None:
+        return cached
     with get_session() as session:
-        statement = select(User).where(User.id == user_id)
-        user = session.exec(statement).first()
-        if not user:
-            user = User(id=user_id)
-            session.add(user)
-            session.commit()
-            session.refresh(user)
-        return user
+        return _load_or_create_user(session, user_id)
 
 
 def reset_missions(user_id: int):
@@ -104,91 +522,158 @@ def assign_mission(
     days_valid: int | None = None,
     mission_type: str = "generic",
     goal: int = 1,
-) -> Mission:
+) -> MissionView:
     """Create a mission for a user."""
     expires_at = None
     if days_valid is not None:
         expires_at = datetime.utcnow() + timedelta(days=days_valid)
-    mission = Mission(
-        user_id=user_id,
-        description=description,
-        points=points,
-        type=mission_type,
-        goal=goal,
-        expires_at=expires_at,
+    template = _template_for(description, points, mission_type, goal)
+    statement = (
+        insert(Mission)
+        .values(
+            user_id=user_id,
+            template_id=template.id,
+            progress=0,
+            expires_at=expires_at,
+            warning_sent=False,
+        )
+        .returning(Mission)
     )
     with get_session() as session:
-        session.add(mission)
+        mission = session.scalars(statement).one()
+        session.expunge(mission)
+        session.commit()
+    _notify_expiry(expires_at)
+    return _mission_view(mission, template)
+
+
+def import_missions(rows: List[dict]) -> int:
+    """Insert a batch of missions with one executemany in one transaction.
+
+    Their templates are resolved with multi-row upserts in the same
+    transaction. Each row holds ``user_id``, ``description``, ``points``, ``type``,
+    ``goal`` and ``expires_at``. Returns the number of missions created.
+    """
+    if not rows:
+        return 0
+
+    def key(row: dict) -> TemplateKey:
+        return (row["type"], row["description"], row["points"], row["goal"])
+
+    with get_session() as session:
+        templates = _resolve_templates(session, map(key, rows))
+        session.execute(
+            insert(Mission),
+            [
+                {
+                    "user_id": row["user_id"],
+                    "template_id": templates[key(row)].id,
+                    "progress": 0,
+                    "expires_at": row["expires_at"],
+                    "warning_sent": False,
+                }
+                for row in rows
+            ],
+        )
         session.commit()
-        session.refresh(mission)
-    return mission
+    _cache_templates(templates)
+    for expires_at in {row["expires_at"] for row in rows}:
+        _notify_expiry(expires_at)
+    return len(rows)
 
 
 def update_mission_progress(
     user_id: int, mission_id: int, amount: int = 1
-) -> Optional[Mission]:
+) -> Optional[MissionView]:
     """Increment mission progress and complete if goal reached."""
     with get_session() as session:
-        mission = session.get(Mission, mission_id)
-        if not mission or mission.user_id != user_id:
+        statement = (
+            update(Mission)
+            .where(Mission.id == mission_id, Mission.user_id == user_id)
+            .values(progress=Mission.progress + amount)
+            .returning(Mission)
+            .execution_options(synchronize_session=False)
+        )
+        mission = session.scalars(statement).first()
+        if not mission:
             return None
-        mission.progress += amount
-        if mission.progress >= mission.goal:
-            reward = calculate_reward(mission)
-            user = session.get(User, user_id)
-            if user:
-                user.points += reward
-                user.level = user.points // 100 + 1
-                session.delete(mission)
-                session.add(user)
-                session.commit()
-                return mission
-        session.add(mission)
+        session.expunge(mission)
+        template = _templates(session, [mission.template_id])[mission.template_id]
+        credited = []
+        if mission.progress >= template.goal:
+            # only the request that actually deletes the mission gets the reward
+            removed = session.execute(delete(Mission).where(Mission.id == mission_id))
+            if removed.rowcount:
+                credited = _credit_points(
+                    session, [user_id], template.reward, "mission", mission_id
+                )
         session.commit()
-        session.refresh(mission)
-        return mission
+    for uid, points, level in credited:
+        _points_changed(uid, points, level)
+    return _mission_view(mission, template)
 
 
-def get_active_missions(user_id: int) -> List[Mission]:
+def get_active_missions(user_id: int) -> List[MissionView]:
     """Return missions that are not expired."""
-    now = datetime.utcnow()
     with get_session() as session:
-        statement = select(Mission).where(Mission.user_id == user_id)
-        missions = session.exec(statement).all()
-        return [m for m in missions if m.expires_at is None or m.expires_at > now]
+        return _mission_views(session, session.exec(_active_missions_query(user_id)).all())
+
+
+def _active_missions_query(user_id: int):
+    now = datetime.utcnow()
+    return select(Mission).where(
+        Mission.user_id == user_id,
+        (Mission.expires_at == None) | (Mission.expires_at > now),
+    )
 
 
-def complete_mission(user_id: int, mission_id: int) -> Optional[Mission]:
+def complete_mission(user_id: int, mission_id: int) -> Optional[MissionView]:
     """Mark mission as completed and award points."""
     with get_session() as session:
-        mission = session.get(Mission, mission_id)
-        user = session.get(User, user_id)
-        if not mission or not user or mission.user_id != user_id:
+        statement = (
+            delete(Mission)
+            .where(Mission.id == mission_id, Mission.user_id == user_id)
+            .returning(Mission)
+            .execution_options(synchronize_session=False)
+        )
+        mission = session.scalars(statement).first()
+        if not mission:
+            return None
+        session.expunge(mission)
+        template = _templates(session, [mission.template_id])[mission.template_id]
+        credited = _credit_points(
+            session, [user_id], template.reward, "mission", mission_id
+        )
+        if not credited:
+            session.rollback()
             return None
-        reward = calculate_reward(mission)
-        user.points += reward
-        user.level = user.points // 100 + 1
-        session.delete(mission)
-        session.add(user)
         session.commit()
-        session.refresh(user)
-        return mission
+    _points_changed(*credited[0])
+    return _mission_view(mission, template)
 
 
-def remove_expired_missions() -> None:
+def remove_expired_missions() -> int:
     """Delete missions past their expiry date."""
     now = datetime.utcnow()
     with get_session() as session:
-        statement = select(Mission).where(
-            Mission.expires_at != None, Mission.expires_at < now
+        statement = delete(Mission).where(
+            Mission.expires_at != None, Mission.expires_at <= now
         )
-        missions = session.exec(statement).all()
-        for m in missions:
-            session.delete(m)
+        removed = session.execute(statement).rowcount
         session.commit()
+        return removed
+
 
+def get_mission_expiries(until: datetime | None = None) -> List[datetime]:
+    """Return the distinct expiry times of missions, optionally up to ``until``."""
+    with get_session() as session:
+        statement = select(Mission.expires_at).where(Mission.expires_at != None).distinct()
+        if until is not None:
+            statement = statement.where(Mission.expires_at <= until)
+        return session.exec(statement).all()
 
-def get_missions_near_expiry(hours: int = 24) -> List[Mission]:
+
+def get_missions_near_expiry(hours: int = 24) -> List[MissionView]:
     """Return missions that will expire within the given hours and haven't been warned."""
     threshold = datetime.utcnow() + timedelta(hours=hours)
     with get_session() as session:
@@ -198,8 +683,7 @@ def get_missions_near_expiry(hours: int = 24) -> List[Mission]:
             Mission.expires_at > datetime.utcnow(),
             Mission.warning_sent == False,
         )
-        missions = session.exec(statement).all()
-        return missions
+        return _mission_views(session, session.exec(statement).all())
 
 
 def mark_warning_sent(mission_id: int) -> None:
@@ -211,6 +695,21 @@ def mark_warning_sent(mission_id: int) -> None:
             session.commit()
 
 
+def mark_warnings_sent(mission_ids: List[int]) -> int:
+    """Flag expiry warnings as sent for many missions at once."""
+    updated = 0
+    with get_session() as session:
+        for i in range(0, len(mission_ids), 500):
+            statement = (
+                update(Mission)
+                .where(Mission.id.in_(mission_ids[i : i + 500]))
+                .values(warning_sent=True)
+            )
+            updated += session.execute(statement).rowcount
+        session.commit()
+    return updated
+
+
 def get_all_users() -> List[User]:
     """Return all registered users."""
     with get_session() as session:
@@ -218,6 +717,12 @@ def get_all_users() -> List[User]:
         return session.exec(statement).all()
 
 
+def get_user_points() -> List[tuple[int, int]]:
+    """Return ``(user_id, points)`` for every user, used to build the ranking."""
+    with get_session() as session:
+        return session.exec(select(User.id, User.points)).all()
+
+
 def get_top_users(limit: int = 10) -> List[User]:
     """Return users ordered by points descending."""
     with get_session() as session:
@@ -225,106 +730,155 @@ def get_top_users(limit: int = 10) -> List[User]:
         return session.exec(statement).all()
 
 
+ASSIGN_CHUNK_SIZE = 5000
+
+
+@dataclass
+class AssignmentReport:
+    """Outcome of a bulk mission assignment."""
+
+    created: int
+    elapsed: float  # seconds
+
+
+def _assign_to_all_users(
+    description: str,
+    points: int,
+    mission_type: str,
+    goal: int,
+    start: datetime,
+    end: datetime,
+) -> AssignmentReport:
+    """Give every user a mission of ``mission_type`` unless one expires in (start, end].
+
+    Users are processed in id ranges of ``ASSIGN_CHUNK_SIZE``; each range is a
+    single INSERT ... SELECT with an anti-join, committed on its own.
+    """
+    began = time.perf_counter()
+    template = _template_for(description, points, mission_type, goal)
+    same_type = select(MissionTemplate.id).where(MissionTemplate.type == mission_type)
+    columns = Mission.__table__.c
+    created = 0
+    lower: int | None = None
+    with get_session() as session:
+        while True:
+            bounds = [] if lower is None else [User.id > lower]
+            upper = session.exec(
+                select(User.id)
+                .where(*bounds)
+                .order_by(User.id)
+                .offset(ASSIGN_CHUNK_SIZE - 1)
+                .limit(1)
+            ).first()
+            if upper is not None:
+                bounds.append(User.id <= upper)
+            # missions handed out for this period expire at its end
+            already_assigned = exists().where(
+                Mission.user_id == User.id,
+                Mission.template_id.in_(same_type),
+                Mission.expires_at > start,
+                Mission.expires_at <= end,
+            )
+            rows = select(
+                User.id,
+                literal(template.id, columns.template_id.type),
+                literal(0, columns.progress.type),
+                literal(end, columns.expires_at.type),
+                literal(False, columns.warning_sent.type),
+            ).where(*bounds, ~already_assigned)
+            statement = insert(Mission).from_select(
+                ["user_id", "template_id", "progress", "expires_at", "warning_sent"],
+                rows,
+            )
+            created += session.execute(statement).rowcount
+            session.commit()
+            if upper is None:
+                break
+            lower = upper
+    if created:
+        _notify_expiry(end)
+    return AssignmentReport(created=created, elapsed=time.perf_counter() - began)
+
+
 def assign_daily_missions(
     description: str,
     points: int,
     goal: int = 1,
-) -> None:
+) -> AssignmentReport:
     """Assign a daily mission to all users if they don't have it for today."""
     today = datetime.utcnow().date()
     start = datetime.combine(today, datetime.min.time())
     end = start + timedelta(days=1)
-    with get_session() as session:
-        users = session.exec(select(User)).all()
-        for user in users:
-            statement = select(Mission).where(
-                Mission.user_id == user.id,
-                Mission.type == "daily",
-                Mission.created_at >= start,
-                Mission.created_at < end,
-            )
-            exists = session.exec(statement).first()
-            if not exists:
-                mission = Mission(
-                    user_id=user.id,
-                    description=description,
-                    points=points,
-                    type="daily",
-                    goal=goal,
-                    expires_at=end,
-                )
-                session.add(mission)
-        session.commit()
+    return _assign_to_all_users(description, points, "daily", goal, start, end)
 
 
 def assign_weekly_missions(
     description: str,
     points: int,
     goal: int = 1,
-) -> None:
+) -> AssignmentReport:
     """Assign a weekly mission to all users if they don't have it for this week."""
-    today = datetime.utcnow().date()
-    # Calculate Monday of the current week
-    monday = today - timedelta(days=today.weekday())
-    start = datetime.combine(monday, datetime.min.time())
+    start = _week_start(datetime.utcnow().date())
     end = start + timedelta(days=7)
-    with get_session() as session:
-        users = session.exec(select(User)).all()
-        for user in users:
-            statement = select(Mission).where(
-                Mission.user_id == user.id,
-                Mission.type == "weekly",
-                Mission.created_at >= start,
-                Mission.created_at < end,
-            )
-            exists = session.exec(statement).first()
-            if not exists:
-                mission = Mission(
-                    user_id=user.id,
-                    description=description,
-                    points=points,
-                    type="weekly",
-                    goal=goal,
-                    expires_at=end,
-                )
-                session.add(mission)
-        session.commit()
+    return _assign_to_all_users(description, points, "weekly", goal, start, end)
 
 
-def get_weekly_mission(user_id: int) -> Optional[Mission]:
+def get_weekly_mission(user_id: int) -> Optional[MissionView]:
     """Return the active weekly mission for the given user."""
     today = datetime.utcnow().date()
     monday = today - timedelta(days=today.weekday())
     start = datetime.combine(monday, datetime.min.time())
     end = start + timedelta(days=7)
     with get_session() as session:
-        statement = select(Mission).where(
-            Mission.user_id == user_id,
-            Mission.type == "weekly",
-            Mission.created_at >= start,
-            Mission.created_at < end,
+        statement = (
+            select(Mission)
+            .join(MissionTemplate, MissionTemplate.id == Mission.template_id)
+            .where(
+                Mission.user_id == user_id,
+                MissionTemplate.type == "weekly",
+                Mission.expires_at > start,
+                Mission.expires_at <= end,
+            )
         )
-        return session.exec(statement).first()
+        mission = session.exec(statement).first()
+        if mission is None:
+            return None
+        return _mission_views(session, [mission])[0]
 
 
 def award_achievement(user_id: int, name: str, description: str) -> Achievement:
-    """Grant an achievement and update user badges."""
-    achievement = Achievement(
-        user_id=user_id,
-        name=name,
-        description=description,
+    """Grant an achievement once and count it as a badge.
+
+    Awarding a badge the user already has returns the existing row.
+    """
+    statement = (
+        sqlite_insert(Achievement)
+        .values(
+            user_id=user_id,
+            name=name,
+            description=description,
+            awarded_at=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=["user_id", "name"])
+        .returning(Achievement)
     )
     with get_session() as session:
-        session.add(achievement)
-        user = session.get(User, user_id)
-        if user:
-            badges = {b for b in user.badges.split(",") if b}
-            badges.add(name)
-            user.badges = ",".join(badges)
-            session.add(user)
+        achievement = session.scalars(statement).first()
+        if achievement is None:
+            existing = select(Achievement).where(
+                Achievement.user_id == user_id, Achievement.name == name
+            )
+            return session.exec(existing).first()
+        session.expunge(achievement)
+        session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(badge_count=User.badge_count + 1)
+            .execution_options(synchronize_session=False)
+        )
         session.commit()
-        session.refresh(achievement)
-        return achievement
+    user_cache.discard(user_id)
+    return achievement
 
 
 def get_user_achievements(user_id: int) -> List[Achievement]:
@@ -334,6 +888,23 @@ def get_user_achievements(user_id: int) -> List[Achievement]:
         return session.exec(statement).all()
 
 
+# Bumped after every committed change to the Reward table so cached copies
+# of the catalog know they are stale.
+_reward_catalog_version = 0
+_reward_catalog_lock = threading.Lock()
+
+
+def reward_catalog_version() -> int:
+    return _reward_catalog_version
+
+
+def _reward_catalog_changed() -> None:
+    global _reward_catalog_version
+    # called from run_db worker threads
+    with _reward_catalog_lock:
+        _reward_catalog_version += 1
+
+
 def add_reward(name: str, description: str, cost: int) -> Reward:
     """Create a new reward available in the store."""
     reward = Reward(name=name, description=description, cost=cost)
@@ -341,7 +912,8 @@ def add_reward(name: str, description: str, cost: int) -> Reward:
         session.add(reward)
         session.commit()
         session.refresh(reward)
-        return reward
+    _reward_catalog_changed()
+    return reward
 
 
 def get_rewards() -> List[Reward]:
@@ -351,20 +923,31 @@ def get_rewards() -> List[Reward]:
         return session.exec(statement).all()
 
 
-def redeem_reward(user_id: int, reward_id: int) -> Reward | None:
-    """Deduct points from user and redeem the selected reward."""
+def redeem_reward(
+    user_id: int, reward_id: int, reward: Reward | None = None
+) -> Reward | None:
+    """Deduct points from user and redeem the selected reward.
+
+    Rewards never change once created, so callers may pass the catalog's
+    copy of the reward to skip looking it up.
+    """
     with get_session() as session:
-        user = session.get(User, user_id)
-        reward = session.get(Reward, reward_id)
-        if not user or not reward or user.points < reward.cost:
-            return None
-        user.points -= reward.cost
+        if reward is None:
+            reward = session.get(Reward, reward_id)
+            if not reward:
+                return None
+            session.expunge(reward)
         purchase = Purchase(user_id=user_id, reward_id=reward_id)
-        session.add(user)
         session.add(purchase)
+        session.flush()
+        balance = _debit_points(session, user_id, reward.cost, "purchase", purchase.id)
+        if balance is None:
+            session.rollback()
+            return None
+        _count_purchase(session, purchase)
         session.commit()
-        session.refresh(reward)
-        return reward
+    _points_changed(user_id, balance)
+    return reward
 
 
 def get_user_purchases(user_id: int) -> List[Purchase]:
@@ -374,96 +957,614 @@ def get_user_purchases(user_id: int) -> List[Purchase]:
         return session.exec(statement).all()
 
 
+@dataclass
+class PurchaseEntry:
+    """A purchase joined with the name of its reward."""
+
+    id: int
+    reward_id: int
+    reward_name: Optional[str]
+    purchased_at: datetime
+
+
+@dataclass
+class PurchasePage:
+    entries: List[PurchaseEntry]  # newest first
+    has_older: bool
+    has_newer: bool
+
+
+PurchaseCursor = tuple[datetime, int]  # (purchased_at, id)
+
+
+def get_purchase_page(
+    user_id: int,
+    before: PurchaseCursor | None = None,
+    after: PurchaseCursor | None = None,
+    limit: int = 10,
+) -> PurchasePage:
+    """Return one page of a user's purchases, newest first.
+
+    Pages are addressed by keyset: ``before`` walks to older purchases from
+    the last entry of a page, ``after`` walks back to newer ones from its
+    first entry.
+    """
+    key = tuple_(Purchase.purchased_at, Purchase.id)
+    statement = (
+        select(Purchase.id, Purchase.reward_id, Reward.name, Purchase.purchased_at)
+        .outerjoin(Reward, Reward.id == Purchase.reward_id)
+        .where(Purchase.user_id == user_id)
+        .limit(limit + 1)
+    )
+    if after is not None:
+        statement = statement.where(key > tuple_(*after)).order_by(
+            Purchase.purchased_at, Purchase.id
+        )
+    else:
+        if before is not None:
+            statement = statement.where(key < tuple_(*before))
+        statement = statement.order_by(
+            Purchase.purchased_at.desc(), Purchase.id.desc()
+        )
+    with get_session() as session:
+        rows = session.exec(statement).all()
+    more = len(rows) > limit
+    entries = [PurchaseEntry(*row) for row in rows[:limit]]
+    if after is not None:
+        entries.reverse()
+        return PurchasePage(entries, has_older=True, has_newer=more)
+    return PurchasePage(entries, has_older=more, has_newer=before is not None)
+
+
 def _week_start(date: date) -> datetime:
     monday = date - timedelta(days=date.weekday())
     return datetime.combine(monday, datetime.min.time())
 
 
+# Message counters are buffered in memory and written in batches, keyed by
+# (user_id, week_start). Readers merge the pending deltas into their results.
+ACTIVITY_FLUSH_SIZE = 500
+ACTIVITY_FLUSH_INTERVAL = 30.0  # seconds
+
+_activity_buffer: dict[tuple[int, datetime], int] = {}
+_activity_lock = threading.Lock()
+# Held while a flush is being written so readers never count a delta twice.
+_activity_flush_lock = threading.RLock()
+_activity_last_flush = time.monotonic()
+
+
 def record_user_message(user_id: int) -> None:
     """Increase weekly message count for a user."""
-    start = _week_start(datetime.utcnow().date())
-    with get_session() as session:
-        statement = select(WeeklyActivity).where(
-            WeeklyActivity.user_id == user_id,
-            WeeklyActivity.week_start == start,
+    key = (user_id, _week_start(datetime.utcnow().date()))
+    with _activity_lock:
+        _activity_buffer[key] = _activity_buffer.get(key, 0) + 1
+        due = (
+            len(_activity_buffer) >= ACTIVITY_FLUSH_SIZE
+            or time.monotonic() - _activity_last_flush >= ACTIVITY_FLUSH_INTERVAL
         )
-        stat = session.exec(statement).first()
-        if not stat:
-            stat = WeeklyActivity(user_id=user_id, week_start=start)
-        stat.message_count += 1
-        session.add(stat)
-        session.commit()
+    if due:
+        flush_activity_buffer()
+
+
+def _pending_activity(week_start: datetime) -> dict[int, int]:
+    with _activity_lock:
+        return {
+            user_id: count
+            for (user_id, start), count in _activity_buffer.items()
+            if start == week_start
+        }
+
+
+def flush_activity_buffer() -> int:
+    """Write buffered message counts in a single transaction.
+
+    Returns the number of (user, week) counters persisted.
+    """
+    global _activity_last_flush
+    with _activity_flush_lock:
+        with _activity_lock:
+            pending = dict(_activity_buffer)
+            _activity_buffer.clear()
+            _activity_last_flush = time.monotonic()
+        if not pending:
+            return 0
+        try:
+            statement = sqlite_insert(WeeklyActivity)
+            statement = statement.on_conflict_do_update(
+                index_elements=["user_id", "week_start"],
+                set_={
+                    "message_count": WeeklyActivity.message_count
+                    + statement.excluded.message_count
+                },
+            )
+            with get_session() as session:
+                session.execute(
+                    statement,
+                    [
+                        {"user_id": user_id, "week_start": start, "message_count": count}
+                        for (user_id, start), count in pending.items()
+                    ],
+                )
+                session.commit()
+        except Exception:
+            # keep the counts so the next flush retries them
+            with _activity_lock:
+                for key, count in pending.items():
+                    _activity_buffer[key] = _activity_buffer.get(key, 0) + count
+            raise
+        return len(pending)
 
 
 def get_weekly_activity(limit: int = 5, week: date | None = None) -> List[WeeklyActivity]:
     """Return top weekly activity for the given week."""
     week_start = _week_start(week or datetime.utcnow().date())
+    if week_start < _week_start(datetime.utcnow().date()):
+        archived = _archived_activity(week_start, limit)
+        if archived:
+            return archived
+    with _activity_flush_lock:
+        pending = _pending_activity(week_start)
+        with get_session() as session:
+            statement = (
+                select(WeeklyActivity)
+                .where(WeeklyActivity.week_start == week_start)
+                .order_by(WeeklyActivity.message_count.desc())
+                .limit(limit)
+            )
+            stats = {s.user_id: s for s in session.exec(statement).all()}
+            # only users with pending deltas can overtake the stored top rows
+            missing = [uid for uid in pending if uid not in stats]
+            if missing:
+                statement = select(WeeklyActivity).where(
+                    WeeklyActivity.week_start == week_start,
+                    WeeklyActivity.user_id.in_(missing),
+                )
+                stats.update({s.user_id: s for s in session.exec(statement).all()})
+    for user_id, count in pending.items():
+        stat = stats.get(user_id)
+        if stat is None:
+            stats[user_id] = WeeklyActivity(
+                user_id=user_id, week_start=week_start, message_count=count
+            )
+        else:
+            stat.message_count += count
+    ranked = sorted(stats.values(), key=lambda s: s.message_count, reverse=True)
+    return ranked[:limit]
+
+
+def get_user_weekly_stat(user_id: int) -> Optional[WeeklyActivity]:
+    start = _week_start(datetime.utcnow().date())
+    with _activity_flush_lock:
+        with _activity_lock:
+            pending = _activity_buffer.get((user_id, start), 0)
+        with get_session() as session:
+            statement = select(WeeklyActivity).where(
+                WeeklyActivity.user_id == user_id,
+                WeeklyActivity.week_start == start,
+            )
+            stat = session.exec(statement).first()
+    if stat is None:
+        if not pending:
+            return None
+        return WeeklyActivity(user_id=user_id, week_start=start, message_count=pending)
+    stat.message_count += pending
+    return stat
+
+
+def _archived_activity(week_start: datetime, limit: int) -> List[WeeklyActivity]:
     with get_session() as session:
         statement = (
-            select(WeeklyActivity)
-            .where(WeeklyActivity.week_start == week_start)
-            .order_by(WeeklyActivity.message_count.desc())
+            select(WeeklyActivityArchive)
+            .where(WeeklyActivityArchive.week_start == week_start)
+            .order_by(WeeklyActivityArchive.rank)
             .limit(limit)
         )
-        return session.exec(statement).all()
+        return [
+            WeeklyActivity(
+                user_id=row.user_id, week_start=week_start, message_count=row.message_count
+            )
+            for row in session.exec(statement).all()
+        ]
 
 
-def get_user_weekly_stat(user_id: int) -> Optional[WeeklyActivity]:
-    start = _week_start(datetime.utcnow().date())
+def get_lifetime_activity(user_id: int) -> Optional[LifetimeActivity]:
+    """Return the user's message totals of all rolled over weeks."""
     with get_session() as session:
-        statement = select(WeeklyActivity).where(
-            WeeklyActivity.user_id == user_id,
-            WeeklyActivity.week_start == start,
+        return session.get(LifetimeActivity, user_id)
+
+
+ACTIVITY_PRUNE_CHUNK_SIZE = 5000
+
+
+@dataclass
+class RolloverReport:
+    """Outcome of a weekly activity rollover."""
+
+    weeks: int  # finished weeks archived and folded into lifetime totals
+    archived: int  # top rows written to the archive
+    pruned: int  # raw weekly rows deleted
+    elapsed: float  # seconds
+
+
+def _archive_week(session: Session, week_start: datetime, top_n: int) -> int:
+    top = session.execute(
+        select(WeeklyActivity.user_id, WeeklyActivity.message_count)
+        .where(WeeklyActivity.week_start == week_start)
+        .order_by(WeeklyActivity.message_count.desc(), WeeklyActivity.user_id)
+        .limit(top_n)
+    ).all()
+    if top:
+        session.execute(
+            sqlite_insert(WeeklyActivityArchive).on_conflict_do_nothing(
+                index_elements=["week_start", "rank"]
+            ),
+            [
+                {
+                    "week_start": week_start,
+                    "rank": rank,
+                    "user_id": user_id,
+                    "message_count": count,
+                }
+                for rank, (user_id, count) in enumerate(top, start=1)
+            ],
         )
-        return session.exec(statement).first()
+    return len(top)
+
+
+def _fold_week(session: Session, week_start: datetime) -> None:
+    statement = sqlite_insert(LifetimeActivity).from_select(
+        ["user_id", "message_count", "weeks_active", "last_week"],
+        select(
+            WeeklyActivity.user_id,
+            WeeklyActivity.message_count,
+            literal(1),
+            WeeklyActivity.week_start,
+        ).where(WeeklyActivity.week_start == week_start),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={
+            "message_count": LifetimeActivity.message_count
+            + statement.excluded.message_count,
+            "weeks_active": LifetimeActivity.weeks_active + 1,
+            "last_week": statement.excluded.last_week,
+        },
+        # a week that was already folded is never counted twice
+        where=LifetimeActivity.last_week < statement.excluded.last_week,
+    )
+    session.execute(statement)
+
+
+def rollover_weekly_activity(
+    today: date | None = None,
+    top_n: int | None = None,
+    retention_weeks: int | None = None,
+) -> RolloverReport:
+    """Archive and fold every finished week, then prune old raw rows.
+
+    Each finished week still in ``WeeklyActivity`` has its top ``top_n``
+    frozen into ``WeeklyActivityArchive`` and its counts added to
+    ``LifetimeActivity``. Rows older than ``retention_weeks`` before the
+    current week are deleted in chunks. Safe to run repeatedly.
+    """
+    began = time.perf_counter()
+    top_n = settings.activity_archive_top_n if top_n is None else top_n
+    if retention_weeks is None:
+        retention_weeks = settings.activity_retention_weeks
+    current = _week_start(today or datetime.utcnow().date())
+    flush_activity_buffer()
+
+    rolled = archived = 0
+    with get_session() as session:
+        weeks = session.exec(
+            select(WeeklyActivity.week_start)
+            .where(WeeklyActivity.week_start < current)
+            .distinct()
+            .order_by(WeeklyActivity.week_start)
+        ).all()
+        for week_start in weeks:
+            if session.get(WeeklyActivityArchive, (week_start, 1)) is not None:
+                continue
+            archived += _archive_week(session, week_start, top_n)
+            _fold_week(session, week_start)
+            session.commit()
+            rolled += 1
+
+    cutoff = current - timedelta(weeks=retention_weeks)
+    pruned = 0
+    while True:
+        with get_session() as session:
+            chunk = (
+                select(WeeklyActivity.id)
+                .where(WeeklyActivity.week_start < cutoff)
+                .limit(ACTIVITY_PRUNE_CHUNK_SIZE)
+            )
+            # weeks that were never archived are left for the next rollover
+            chunk = chunk.where(
+                exists().where(
+                    WeeklyActivityArchive.week_start == WeeklyActivity.week_start
+                )
+            )
+            deleted = session.execute(
+                delete(WeeklyActivity).where(WeeklyActivity.id.in_(chunk.scalar_subquery()))
+            ).rowcount
+            session.commit()
+        pruned += deleted
+        if deleted < ACTIVITY_PRUNE_CHUNK_SIZE:
+            break
+    return RolloverReport(
+        weeks=rolled,
+        archived=archived,
+        pruned=pruned,
+        elapsed=time.perf_counter() - began,
+    )
+
+
+@dataclass
+class UserSnapshot:
+    """Everything the profile and mission views show about a user."""
+
+    user_id: int
+    level: int
+    points: int
+    badge_count: int
+    missions: List[MissionView]
+    weekly_messages: int
+
+
+def get_user_snapshot(user_id: int) -> UserSnapshot:
+    """Load a user with active missions and weekly count in one session.
+
+    The user is created if missing, like ``get_or_create_user``.
+    """
+    start = _week_start(datetime.utcnow().date())
+    with get_session() as session:
+        user = _cached_user(user_id) or _load_or_create_user(session, user_id)
+        missions = _mission_views(session, session.exec(_active_missions_query(user_id)).all())
+        with _activity_flush_lock:
+            with _activity_lock:
+                pending = _activity_buffer.get((user_id, start), 0)
+            statement = select(WeeklyActivity.message_count).where(
+                WeeklyActivity.user_id == user_id,
+                WeeklyActivity.week_start == start,
+            )
+            stored = session.exec(statement).first() or 0
+    return UserSnapshot(
+        user_id=user.id,
+        level=user.level,
+        points=user.points,
+        badge_count=user.badge_count,
+        missions=missions,
+        weekly_messages=stored + pending,
+    )
 
 
 def reward_top_weekly_users(
-    week: date, top_n: int = 3, points: int = 10
+    week: date, top_n: int = 3, points: int = 10, job: str | None = None
 ) -> list[User]:
-    """Award extra points to the most active users of the given week."""
+    """Award extra points to the most active users of the given week.
+
+    With ``job``, the week is recorded as that job's last closed period in
+    the same transaction as the credit, and a week the job has already
+    closed pays nothing, so retries never pay a week twice.
+    """
+    flush_activity_buffer()
     week_start = _week_start(week)
     with get_session() as session:
+        if job is not None:
+            state = session.get(JobState, job)
+            if state is not None and state.period > week_start.date():
+                return []
         statement = (
-            select(WeeklyActivity)
+            select(WeeklyActivity.user_id)
             .where(WeeklyActivity.week_start == week_start)
             .order_by(WeeklyActivity.message_count.desc())
             .limit(top_n)
         )
-        stats = session.exec(statement).all()
-        rewarded: list[User] = []
-        for stat in stats:
-            user = session.get(User, stat.user_id)
-            if user:
-                user.points += points
-                user.level = user.points // 100 + 1
-                session.add(user)
-        rewarded.append(user)
-    session.commit()
+        user_ids = session.exec(statement).all()
+        credited = []
+        if user_ids:
+            credited = _credit_points(session, list(user_ids), points, "weekly_bonus")
+        if job is not None:
+            _set_job_period(session, job, week_start.date() + timedelta(days=7))
+        session.commit()
+    rewarded = []
+    for uid, balance, level in credited:
+        _points_changed(uid, balance, level)
+        rewarded.append(User(id=uid, points=balance, level=level))
     return rewarded
 
 
-def get_monthly_purchase_summary(month: date) -> list[tuple[Reward | None, int]]:
-    """Return count of purchases per reward for the given month."""
-    start = datetime(month.year, month.month, 1)
-    if month.month == 12:
-        next_month = datetime(month.year + 1, 1, 1)
-    else:
-        next_month = datetime(month.year, month.month + 1, 1)
+def get_points_ledger(user_id: int) -> List[PointsLedger]:
+    """Return the ledger entries of a user, oldest first."""
+    with get_session() as session:
+        statement = (
+            select(PointsLedger)
+            .where(PointsLedger.user_id == user_id)
+            .order_by(PointsLedger.id)
+        )
+        return session.exec(statement).all()
+
+
+def audit_points() -> List[tuple[int, int, int]]:
+    """Return ``(user_id, points, ledger_total)`` for users whose balance
+    does not match the sum of their ledger entries."""
+    with get_session() as session:
+        totals = (
+            select(PointsLedger.user_id, func.sum(PointsLedger.delta).label("total"))
+            .group_by(PointsLedger.user_id)
+            .subquery()
+        )
+        ledger_total = func.coalesce(totals.c.total, 0)
+        statement = (
+            select(User.id, User.points, ledger_total)
+            .outerjoin(totals, totals.c.user_id == User.id)
+            .where(User.points != ledger_total)
+        )
+        return [tuple(row) for row in session.exec(statement).all()]
+
 
+def rebuild_points() -> List[tuple[int, int, int]]:
+    """Reset every balance that disagrees with the ledger to the ledger total.
+
+    Runs as one statement so concurrent changes cannot slip in between the
+    check and the fix. Returns ``(user_id, points, level)`` of corrected users.
+    """
+    ledger_total = (
+        select(func.coalesce(func.sum(PointsLedger.delta), 0))
+        .where(PointsLedger.user_id == User.id)
+        .scalar_subquery()
+    )
+    statement = (
+        update(User)
+        .where(User.points != ledger_total)
+        .values(points=ledger_total, level=ledger_total // 100 + 1)
+        .returning(User.id, User.points, User.level)
+        .execution_options(synchronize_session=False)
+    )
     with get_session() as session:
-        statement = select(Purchase).where(
+        rows = [tuple(row) for row in session.execute(statement)]
+        session.commit()
+    for user_id, points, level in rows:
+        _points_changed(user_id, points, level)
+    return rows
+
+
+def _month_start(day: date) -> datetime:
+    return datetime(day.year, day.month, 1)
+
+
+def _next_month(start: datetime) -> datetime:
+    if start.month == 12:
+        return datetime(start.year + 1, 1, 1)
+    return datetime(start.year, start.month + 1, 1)
+
+
+def _count_purchase(session: Session, purchase: Purchase) -> None:
+    """Add a purchase to its monthly rollup inside the caller's transaction."""
+    statement = sqlite_insert(MonthlyPurchaseRollup).values(
+        month=_month_start(purchase.purchased_at),
+        reward_id=purchase.reward_id,
+        purchases=1,
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["month", "reward_id"],
+        set_={"purchases": MonthlyPurchaseRollup.purchases + 1},
+    )
+    session.execute(statement)
+
+
+def _rebuild_month(session: Session, start: datetime) -> int:
+    session.execute(
+        delete(MonthlyPurchaseRollup).where(MonthlyPurchaseRollup.month == start)
+    )
+    counts = session.execute(
+        select(Purchase.reward_id, func.count())
+        .where(
             Purchase.purchased_at >= start,
-            Purchase.purchased_at < next_month,
+            Purchase.purchased_at < _next_month(start),
+        )
+        .group_by(Purchase.reward_id)
+    ).all()
+    if counts:
+        session.execute(
+            insert(MonthlyPurchaseRollup),
+            [
+                {"month": start, "reward_id": reward_id, "purchases": count}
+                for reward_id, count in counts
+            ],
         )
-        purchases = session.exec(statement).all()
-        counts: dict[int, int] = {}
-        for p in purchases:
-            counts[p.reward_id] = counts.get(p.reward_id, 0) + 1
+    return len(counts)
+
+
+def rebuild_monthly_rollups(month: date | None = None) -> int:
+    """Recompute monthly rollups from the purchase history.
+
+    Rebuilds only ``month`` when given, otherwise every month with purchases.
+    Returns the number of months rebuilt.
+    """
+    with get_session() as session:
+        if month is not None:
+            months = [_month_start(month)]
+        else:
+            first, last = session.execute(
+                select(func.min(Purchase.purchased_at), func.max(Purchase.purchased_at))
+            ).one()
+            session.execute(delete(MonthlyPurchaseRollup))
+            months = []
+            if first is not None:
+                start, end = _month_start(first), _month_start(last)
+                while start <= end:
+                    months.append(start)
+                    start = _next_month(start)
+        for start in months:
+            _rebuild_month(session, start)
+        session.commit()
+    return len(months)
+
+
+def get_monthly_purchase_summary(month: date) -> list[tuple[Reward | None, int]]:
+    """Return count of purchases per reward for the given month."""
+    statement = (
+        select(Reward, MonthlyPurchaseRollup.purchases)
+        .select_from(MonthlyPurchaseRollup)
+        .outerjoin(Reward, Reward.id == MonthlyPurchaseRollup.reward_id)
+        .where(MonthlyPurchaseRollup.month == _month_start(month))
+        .order_by(MonthlyPurchaseRollup.purchases.desc(), MonthlyPurchaseRollup.reward_id)
+    )
+    with get_session() as session:
+        return [(reward, count) for reward, count in session.execute(statement).all()]
+
 
-        rewards = {}
-        if counts:
-            statement = select(Reward).where(Reward.id.in_(list(counts.keys())))
-            rewards = {r.id: r for r in session.exec(statement).all()}
+def acquire_lease(name: str, holder: str, ttl: float) -> bool:
+    """Take or renew a lease for ``ttl`` seconds.
 
-        return [(rewards.get(rid), count) for rid, count in counts.items()]
+    Succeeds when the lease is free, expired or already held by ``holder``.
+    Expiry is judged against each worker's clock, so ``ttl`` should be well
+    above the expected clock skew between workers.
+    """
+    now = datetime.utcnow()
+    statement = sqlite_insert(Lease).values(
+        name=name, holder=holder, expires_at=now + timedelta(seconds=ttl)
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["name"],
+        set_={
+            "holder": statement.excluded.holder,
+            "expires_at": statement.excluded.expires_at,
+        },
+        where=(Lease.holder == statement.excluded.holder) | (Lease.expires_at < now),
+    ).returning(Lease.holder)
+    with get_session() as session:
+        acquired = session.execute(statement).first() is not None
+        session.commit()
+    return acquired
+
+
+def release_lease(name: str, holder: str) -> None:
+    """Give up a lease so another worker can take it over immediately."""
+    with get_session() as session:
+        session.execute(delete(Lease).where(Lease.name == name, Lease.holder == holder))
+        session.commit()
+
+
+def get_job_period(name: str) -> date | None:
+    """Return the last period the named job completed, if it ever ran."""
+    with get_session() as session:
+        state = session.get(JobState, name)
+        return state.period if state else None
+
+
+def _set_job_period(session: Session, name: str, period: date) -> None:
+    statement = sqlite_insert(JobState).values(name=name, period=period)
+    statement = statement.on_conflict_do_update(
+        index_elements=["name"], set_={"period": statement.excluded.period}
+    )
+    session.execute(statement)
+
+
+def set_job_period(name: str, period: date) -> None:
+    """Record that the named job has completed ``period``."""
+    with get_session() as session:
+        _set_job_period(session, name, period)
+        session.commit()
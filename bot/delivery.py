@@ -0,0 +1,258 @@
+"""Rate-limited concurrent delivery of outgoing Telegram messages.
+
+Background jobs hand their notifications to a :class:`DeliveryQueue`. A small
+pool of workers sends them while respecting Telegram's global and per-chat
+limits, and retries after flood-control or transient network errors.
+
+Messages wait in one FIFO lane per chat. A chat is handed to the workers only
+when its rate limit allows its next message, so a backlog for one chat never
+holds up the workers while other chats could be served.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Hashable, Iterable
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows ~30 messages/s overall, 1/s to a private chat and
+# 20/min to a group.
+GLOBAL_RATE = 30.0
+PRIVATE_CHAT_RATE = 1.0
+GROUP_CHAT_RATE = 20 / 60
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 1.0  # seconds, doubled on every transient failure
+
+
+class TokenBucket:
+    """Classic token bucket; ``acquire`` waits until a token is available."""
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for the given number of seconds."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    @property
+    def idle(self) -> bool:
+        now = time.monotonic()
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.paused_until
+
+    def delay(self) -> float:
+        """Seconds until a token is available."""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available right now."""
+        if self.delay() > 0:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def acquire(self) -> None:
+        while (wait := self.delay()) > 0:
+            await asyncio.sleep(wait)
+        self.tokens -= 1
+
+
+@dataclass
+class _Message:
+    chat_id: int
+    text: str
+    kwargs: dict
+    future: asyncio.Future
+    attempts: int = 0
+    rejected: bool = False  # Telegram refused it; retrying will not help
+
+
+@dataclass
+class DeliveryReport:
+    """Outcome of :meth:`DeliveryQueue.deliver_many`.
+
+    Keys in neither list failed transiently and may be retried later.
+    """
+
+    delivered: list[Hashable] = field(default_factory=list)
+    rejected: list[Hashable] = field(default_factory=list)
+
+
+class DeliveryQueue:
+    """Bounded worker pool that sends queued messages within rate limits."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        workers: int = 8,
+        global_rate: float = GLOBAL_RATE,
+        max_attempts: int = MAX_ATTEMPTS,
+    ) -> None:
+        self.bot = bot
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._global = TokenBucket(global_rate)
+        self._chats: dict[int, TokenBucket] = {}
+        # a chat has a lane while it has unsent messages; it is then either
+        # waiting for its rate limit, in ``_ready`` or held by one worker
+        self._lanes: dict[int, deque[_Message]] = {}
+        self._ready: asyncio.Queue[int] = asyncio.Queue()
+        self._unfinished = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._worker()) for _ in range(self.workers)
+            ]
+
+    async def stop(self, timeout: float | None = None) -> None:
+        """Wait up to ``timeout`` seconds for queued messages, then stop the workers.
+
+        Messages still unsent afterwards are dropped and resolve to False.
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %d undelivered messages on shutdown", self._unfinished)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for lane in self._lanes.values():
+            for message in lane:
+                self._finish(message, False)
+        self._lanes.clear()
+        self._ready = asyncio.Queue()
+
+    def submit(self, chat_id: int, text: str, **kwargs) -> asyncio.Future:
+        """Queue a message; the returned future resolves to True once delivered."""
+        return self._enqueue(chat_id, text, kwargs).future
+
+    def _enqueue(self, chat_id: int, text: str, kwargs: dict) -> _Message:
+        future = asyncio.get_running_loop().create_future()
+        message = _Message(chat_id, text, kwargs, future)
+        self._unfinished += 1
+        self._idle.clear()
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            self._lanes[chat_id] = deque([message])
+            self._schedule(chat_id)
+        else:
+            lane.append(message)
+        return message
+
+    async def deliver_many(
+        self, messages: Iterable[tuple[Hashable, int, str]]
+    ) -> DeliveryReport:
+        """Send ``(key, chat_id, text)`` messages and report which keys got through."""
+        pending = [
+            (key, self._enqueue(chat_id, text, {})) for key, chat_id, text in messages
+        ]
+        report = DeliveryReport()
+        for key, message in pending:
+            if await message.future:
+                report.delivered.append(key)
+            elif message.rejected:
+                report.rejected.append(key)
+        return report
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10_000:
+                self._chats = {k: b for k, b in self._chats.items() if not b.idle}
+            rate = GROUP_CHAT_RATE if chat_id < 0 else PRIVATE_CHAT_RATE
+            bucket = self._chats[chat_id] = TokenBucket(rate, capacity=1)
+        return bucket
+
+    def _schedule(self, chat_id: int, delay: float = 0.0) -> None:
+        """Hand the chat to the workers once its next message may be sent."""
+        delay = max(delay, self._bucket(chat_id).delay())
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._ready.put_nowait, chat_id)
+        else:
+            self._ready.put_nowait(chat_id)
+
+    def _finish(self, message: _Message, delivered: bool) -> None:
+        if message.future.done():
+            return
+        message.future.set_result(delivered)
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._idle.set()
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = await self._ready.get()
+            lane = self._lanes.get(chat_id)
+            if not lane:
+                continue  # dropped by stop()
+            if not self._bucket(chat_id).try_acquire():
+                # paused by flood control after it was scheduled
+                self._schedule(chat_id)
+                continue
+            await self._global.acquire()
+            message = lane[0]
+            retry_in = await self._send(message)
+            if retry_in is None:
+                lane.popleft()
+            if lane:
+                self._schedule(chat_id, retry_in or 0.0)
+            else:
+                del self._lanes[chat_id]
+
+    async def _send(self, message: _Message) -> float | None:
+        """Try to send once; return the retry delay, or None when finished."""
+        chat_id = message.chat_id
+        message.attempts += 1
+        retry_in = None
+        try:
+            await self.bot.send_message(chat_id, message.text, **message.kwargs)
+            self._finish(message, True)
+            return None
+        except TelegramRetryAfter as exc:
+            logger.warning("Flood control for %s, retry in %ss", chat_id, exc.retry_after)
+            self._bucket(chat_id).pause(exc.retry_after)
+            retry_in = 0.0
+        except (TelegramForbiddenError, TelegramBadRequest) as exc:
+            # blocked the bot, deleted account, unknown chat...
+            logger.info("Dropping message to %s: %s", chat_id, exc.message)
+            message.rejected = True
+        except (TelegramNetworkError, TelegramServerError):
+            retry_in = BACKOFF_BASE * 2 ** (message.attempts - 1)
+        except Exception:  # never let one message kill the worker
+            logger.exception("Delivery to %s failed", chat_id)
+        if retry_in is not None and message.attempts < self.max_attempts:
+            return retry_in
+        if retry_in is not None:
+            logger.warning("Giving up on message to %s", chat_id)
+        self._finish(message, False)
+        return None
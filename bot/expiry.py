@@ -0,0 +1,102 @@
+"""Timer heap that fires mission expiries and expiry warnings when due.
+
+The heap holds deadlines rather than missions: every distinct ``expires_at``
+contributes an expiry deadline and a warning deadline ``warning_window``
+earlier. When a deadline passes, the matching callback runs a targeted,
+indexed query for all missions it covers, so a bulk assignment of thousands
+of missions sharing one expiry costs a single heap entry.
+"""
+
+import asyncio
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+EXPIRE = "expire"
+WARN = "warn"
+
+
+class ExpiryEngine:
+    """Min-heap of upcoming expiry and warning deadlines."""
+
+    def __init__(
+        self,
+        on_expire: Callable[[], Awaitable[object]],
+        on_warn: Callable[[], Awaitable[object]],
+        warning_window: timedelta = timedelta(hours=24),
+    ) -> None:
+        self.on_expire = on_expire
+        self.on_warn = on_warn
+        self.warning_window = warning_window
+        self._heap: list[tuple[datetime, str]] = []
+        self._queued: set[tuple[datetime, str]] = set()
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, expires_at: datetime) -> None:
+        """Track a mission expiry. Safe to call from any thread."""
+        entries = [(expires_at - self.warning_window, WARN), (expires_at, EXPIRE)]
+        with self._lock:
+            head = self._heap[0] if self._heap else None
+            for entry in entries:
+                if entry not in self._queued:
+                    self._queued.add(entry)
+                    heapq.heappush(self._heap, entry)
+            wake = head is None or self._heap[0] < head
+        if wake and self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def schedule_many(self, expiries: Iterable[datetime]) -> None:
+        for expires_at in expiries:
+            self.schedule(expires_at)
+
+    def clear(self) -> None:
+        """Forget every deadline, e.g. when this worker stops leading."""
+        with self._lock:
+            self._heap.clear()
+            self._queued.clear()
+
+    def _pop_due(self, now: datetime) -> set[str]:
+        due = set()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                self._queued.discard(entry)
+                due.add(entry[1])
+        return due
+
+    def _next_deadline(self) -> datetime | None:
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    async def run(self) -> None:
+        """Sleep until the next deadline and fire the due callbacks."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            due = self._pop_due(datetime.utcnow())
+            # expire first so warnings are never sent for removed missions
+            for kind, callback in ((EXPIRE, self.on_expire), (WARN, self.on_warn)):
+                if kind in due:
+                    try:
+                        await callback()
+                    except Exception:
+                        logger.exception("Expiry %s callback failed", kind)
+            # clear before reading the head so a concurrent schedule() wakes us
+            self._wakeup.clear()
+            deadline = self._next_deadline()
+            timeout = None
+            if deadline is not None:
+                timeout = max(0.0, (deadline - datetime.utcnow()).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,65 @@
+"""Leader election for background jobs through database leases.
+
+Every worker handles updates, but each background job runs only on the worker
+that holds its lease. The holder renews the lease every ``ttl / 3`` seconds;
+if it dies, the lease expires and another worker takes the job over. A
+worker that fails to renew cancels its copy of the job straight away.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable
+
+from bot.database import acquire_lease, release_lease, run_db
+
+logger = logging.getLogger(__name__)
+
+
+def worker_id() -> str:
+    """Identify this process among the workers sharing the database."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderLease:
+    """Runs ``job`` only while this worker holds the named lease."""
+
+    def __init__(self, name: str, holder: str, ttl: float = 30.0) -> None:
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+        self.leader = False
+
+    async def _acquire(self) -> bool:
+        try:
+            return await run_db(acquire_lease, self.name, self.holder, self.ttl)
+        except Exception:
+            logger.exception("Could not renew lease %s", self.name)
+            return False
+
+    async def run(self, job: Callable[[], Awaitable[object]]) -> None:
+        task: asyncio.Task | None = None
+        try:
+            while True:
+                if task is not None and task.done():
+                    # a crashed job is restarted on the next renewal
+                    if not task.cancelled() and task.exception() is not None:
+                        logger.error("Job %s failed", self.name, exc_info=task.exception())
+                    task = None
+                self.leader = await self._acquire()
+                if self.leader and task is None:
+                    logger.info("Acquired lease %s, starting job", self.name)
+                    task = asyncio.create_task(job())
+                elif not self.leader and task is not None:
+                    logger.warning("Lost lease %s, stopping job", self.name)
+                    task.cancel()
+                    task = None
+                await asyncio.sleep(self.ttl / 3 if self.leader else self.ttl / 2)
+        finally:
+            if task is not None:
+                task.cancel()
+            if self.leader:
+                self.leader = False
+                await run_db(release_lease, self.name, self.holder)
@@ -1,5 +1,7 @@
 import asyncio
+import logging
 from pathlib import Path
+import signal
 import sys
 
 # Ensure project root is on sys.path when running the file directly
@@ -7,64 +9,121 @@ ROOT_DIR = Path(__file__).resolve().parent.parent
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-from aiogram import Bot, Dispatcher, types, F
+from aiogram import Bot, Dispatcher, Router, types, F
 from aiogram.filters import Command
-from aiogram.types import Message
+from aiogram.types import (
+    CallbackQuery,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message,
+)
 
 from typing import Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 # Use absolute imports so the module can run as a script
 from bot.config import settings
 from bot.database import (
+    init_db,
+    run_db,
     get_or_create_user,
     reset_missions,
     assign_mission,
-    get_active_missions,
+    get_user_snapshot,
     complete_mission,
     update_mission_progress,
-    calculate_reward,
     remove_expired_missions,
     get_missions_near_expiry,
-    mark_warning_sent,
+    get_mission_expiries,
+    expiry_listeners,
+    mark_warnings_sent,
     assign_daily_missions,
     assign_weekly_missions,
-    get_top_users,
+    get_user_points,
     get_user_achievements,
-    get_rewards,
     redeem_reward,
-    get_user_purchases,
+    get_purchase_page,
+    PurchasePage,
     get_weekly_mission,
     record_user_message,
+    flush_activity_buffer,
+    ACTIVITY_FLUSH_INTERVAL,
     get_weekly_activity,
     get_user_weekly_stat,
     reward_top_weekly_users,
+    rollover_weekly_activity,
+    get_lifetime_activity,
+    get_job_period,
+    set_job_period,
 )
 from bot.admin import router as admin_router
+from bot.catalog import cached_catalog, load_catalog
+from bot.delivery import DeliveryQueue
+from bot.expiry import ExpiryEngine
+from bot.leases import LeaderLease, worker_id
+from bot import metrics
+from bot.querylog import QueryBudgetMiddleware
 from bot.menu import router as menu_router
+from bot.ordering import ordering
+from bot.ranking import ranking
+from bot.webhook import WebhookServer
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+# Built by create_app on first use so importing this module stays cheap.
+bot: Bot | None = None
+dp: Dispatcher | None = None
+delivery: DeliveryQueue | None = None
+
+
+def create_app() -> tuple[Bot, Dispatcher]:
+    """Create the bot, dispatcher and delivery queue once."""
+    global bot, dp, delivery
+    if dp is None:
+        bot = Bot(token=settings.bot_token)
+        dispatcher = Dispatcher()
+        # one user's updates run in order; different users run in parallel
+        dispatcher.update.outer_middleware(ordering)
+        handler_metrics = metrics.MetricsMiddleware()
+        query_budget = QueryBudgetMiddleware(
+            settings.query_budget, settings.query_sample_rate
+        )
+        for observer in (dispatcher.message, dispatcher.callback_query):
+            observer.middleware(handler_metrics)
+            observer.middleware(query_budget)
+        dispatcher.include_router(admin_router)
+        dispatcher.include_router(menu_router)
+        dispatcher.include_router(router)
+        delivery = DeliveryQueue(
+            bot, workers=settings.delivery_workers, global_rate=settings.delivery_rate
+        )
+        dp = dispatcher
+    return bot, dp
+
 
-bot = Bot(token=settings.bot_token)
-dp = Dispatcher()
-dp.include_router(admin_router)
-dp.include_router(menu_router)
+# expiry warnings are sent and flagged in batches of this size
+WARNING_BATCH_SIZE = 500
 
 
-@dp.message(Command("start"))
+@router.message(Command("start"))
 async def start_handler(message: Message):
-    user = get_or_create_user(message.from_user.id)
-    if not get_active_missions(user.id):
-        assign_mission(
-            user.id,
+    snapshot = await run_db(get_user_snapshot, message.from_user.id)
+    if not snapshot.missions:
+        await run_db(
+            assign_mission,
+            snapshot.user_id,
             "Env\u00eda un mensaje en el canal",
             2,
             days_valid=1,
             mission_type="message",
             goal=5,
         )
-    await message.answer(f"Bienvenido al bot! Nivel actual: {user.level}")
+    await message.answer(f"Bienvenido al bot! Nivel actual: {snapshot.level}")
 
 
-@dp.message(Command("user"))
+@router.message(Command("user"))
 async def user_status(message: Message):
     if not message.from_user.id:
         return
@@ -73,107 +132,107 @@ async def user_status(message: Message):
     except (IndexError, ValueError):
         await message.answer("Uso: /user <id>")
         return
-    user = get_or_create_user(target_id)
+    user = await run_db(get_or_create_user, target_id)
     await message.answer(
         f"Usuario {target_id}: nivel {user.level}, puntos {user.points}"
     )
 
 
-@dp.message(Command("reset"))
+@router.message(Command("reset"))
 async def reset_user(message: Message):
     try:
         target_id = int(message.text.split(maxsplit=1)[1])
     except (IndexError, ValueError):
         await message.answer("Uso: /reset <id>")
         return
-    reset_missions(target_id)
+    await run_db(reset_missions, target_id)
     await message.answer(f"Misiones de {target_id} reiniciadas")
 
 
-@dp.message(Command("missions"))
+@router.message(Command("missions"))
 async def missions_list(message: Message):
-    user = get_or_create_user(message.from_user.id)
-    missions = get_active_missions(user.id)
-    if not missions:
+    snapshot = await run_db(get_user_snapshot, message.from_user.id)
+    if not snapshot.missions:
         await message.answer("No tienes misiones activas")
         return
     text_lines = [
-        f"ID {m.id}: {m.description} [{m.progress}/{m.goal}] (+{calculate_reward(m)} puntos)"
-        for m in missions
+        f"ID {m.id}: {m.description} [{m.progress}/{m.goal}] (+{m.reward} puntos)"
+        for m in snapshot.missions
     ]
     await message.answer(
-        "\n".join(text_lines) + f"\nPuntos: {user.points} Nivel: {user.level}"
+        "\n".join(text_lines) + f"\nPuntos: {snapshot.points} Nivel: {snapshot.level}"
     )
 
 
-@dp.message(Command("weekly"))
+@router.message(Command("weekly"))
 async def weekly_mission(message: Message):
     """Show the current weekly mission for the user."""
     user_id = message.from_user.id
-    mission = get_weekly_mission(user_id)
+    mission = await run_db(get_weekly_mission, user_id)
     if not mission:
         await message.answer("No tienes un reto semanal asignado actualmente")
         return
-    reward = calculate_reward(mission)
     await message.answer(
         f"Reto semanal: {mission.description}\n"
-        f"Progreso: {mission.progress}/{mission.goal} (+{reward} pts)"
+        f"Progreso: {mission.progress}/{mission.goal} (+{mission.reward} pts)"
     )
 
 
-@dp.message(Command("progress"))
+@router.message(Command("progress"))
 async def progress_command(message: Message):
     try:
         mission_id = int(message.text.split(maxsplit=2)[1])
     except (IndexError, ValueError):
         await message.answer("Uso: /progress <id_mision>")
         return
-    mission = update_mission_progress(message.from_user.id, mission_id)
+    mission = await run_db(update_mission_progress, message.from_user.id, mission_id)
     if not mission:
         await message.answer("Misi\u00f3n no v\u00e1lida")
         return
     if mission.progress >= mission.goal:
-        reward = calculate_reward(mission)
-        await message.answer(f"Misi\u00f3n completada! Ganaste {reward} puntos")
+        await message.answer(f"Misi\u00f3n completada! Ganaste {mission.reward} puntos")
     else:
         await message.answer(f"Progreso actualizado: {mission.progress}/{mission.goal}")
 
 
-@dp.message(Command("complete"))
+@router.message(Command("complete"))
 async def complete_command(message: Message):
     try:
         mission_id = int(message.text.split(maxsplit=1)[1])
     except (IndexError, ValueError):
         await message.answer("Uso: /complete <id_mision>")
         return
-    mission = complete_mission(message.from_user.id, mission_id)
+    mission = await run_db(complete_mission, message.from_user.id, mission_id)
     if not mission:
         await message.answer("Misi\u00f3n no v\u00e1lida")
         return
-    reward = calculate_reward(mission)
-    await message.answer(f"Misi\u00f3n completada! Ganaste {reward} puntos")
+    await message.answer(f"Misi\u00f3n completada! Ganaste {mission.reward} puntos")
 
 
 
 
-@dp.message(Command("ranking"))
+@router.message(Command("ranking"))
 async def ranking_command(message: Message):
-    """Show top users by points."""
-    users = get_top_users(10)
-    if not users:
+    """Show top users by points and the caller's position."""
+    top = ranking.top(10)
+    if not top:
         await message.answer("No hay usuarios registrados")
         return
-    lines = [f"{idx + 1}. {u.id} - {u.points} pts" for idx, u in enumerate(users)]
-    await message.answer("Ranking:\n" + "\n".join(lines))
+    lines = [f"{idx + 1}. {uid} - {points} pts" for idx, (uid, points) in enumerate(top)]
+    text = "Ranking:\n" + "\n".join(lines)
+    position = ranking.rank(message.from_user.id)
+    if position:
+        text += f"\nTu posici\u00f3n: #{position[0]} de {position[1]}"
+    await message.answer(text)
 
 
 
 
-@dp.message(Command("achievements"))
+@router.message(Command("achievements"))
 async def achievements_command(message: Message):
     """Show the achievements of a user."""
     user_id = message.from_user.id
-    achievements = get_user_achievements(user_id)
+    achievements = await run_db(get_user_achievements, user_id)
     if not achievements:
         await message.answer("A\u00fan no tienes logros")
         return
@@ -181,34 +240,35 @@ async def achievements_command(message: Message):
     await message.answer("Tus logros:\n" + "\n".join(lines))
 
 
-@dp.message(Command("weeklystats"))
+@router.message(Command("weeklystats"))
 async def weekly_stats_command(message: Message):
     """Show weekly activity statistics."""
     user_id = message.from_user.id
-    stat = get_user_weekly_stat(user_id)
+    stat = await run_db(get_user_weekly_stat, user_id)
     count = stat.message_count if stat else 0
-    top = get_weekly_activity(5)
+    lifetime = await run_db(get_lifetime_activity, user_id)
+    total = count + (lifetime.message_count if lifetime else 0)
+    top = await run_db(get_weekly_activity, 5)
     lines = [f"{idx+1}. {s.user_id} - {s.message_count}" for idx, s in enumerate(top)]
-    text = f"Mensajes esta semana: {count}"
+    text = f"Mensajes esta semana: {count}\nMensajes totales: {total}"
     if lines:
         text += "\nTop actividad:\n" + "\n".join(lines)
     await message.answer(text)
 
 
-@dp.message(Command("store"))
+@router.message(Command("store"))
 async def store_command(message: Message):
     """List available rewards."""
-    rewards = get_rewards()
-    if not rewards:
+    catalog = cached_catalog() or await run_db(load_catalog)
+    if not catalog.store_text:
         await message.answer("La tienda est\u00e1 vac\u00eda")
         return
-    lines = [f"{r.id}. {r.name} - {r.cost} pts" for r in rewards]
-    await message.answer("Tienda:\n" + "\n".join(lines))
+    await message.answer(catalog.store_text)
 
 
 
 
-@dp.message(Command("buy"))
+@router.message(Command("buy"))
 async def buy_command(message: Message):
     """Redeem a reward using points."""
     try:
@@ -216,11 +276,16 @@ async def buy_command(message: Message):
     except (IndexError, ValueError):
         await message.answer("Uso: /buy <id_recompensa>")
         return
-    reward = redeem_reward(message.from_user.id, reward_id)
+    catalog = cached_catalog() or await run_db(load_catalog)
+    # a reward added by another process is not in the catalog yet; then
+    # redeem_reward looks it up itself
+    reward = await run_db(
+        redeem_reward, message.from_user.id, reward_id, catalog.rewards.get(reward_id)
+    )
     if reward:
         await message.answer("Recompensa canjeada con \u00e9xito")
         if settings.notify_channel_id:
-            await bot.send_message(
+            await message.bot.send_message(
                 settings.notify_channel_id,
                 f"El usuario {message.from_user.id} compr\u00f3 la recompensa {reward.name}",
             )
@@ -228,7 +293,43 @@ async def buy_command(message: Message):
         await message.answer("No tienes suficientes puntos o recompensa inv\u00e1lida")
 
 
-@dp.message(Command("purchases"))
+PURCHASES_PAGE_SIZE = 10
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _purchase_cursor_data(target_id: int, direction: str, entry) -> str:
+    micros = (entry.purchased_at - _EPOCH) // timedelta(microseconds=1)
+    return f"ph:{target_id}:{direction}:{micros}:{entry.id}"
+
+
+def _render_purchase_page(
+    page: PurchasePage, target_id: int, viewer_id: int
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    title = "Tus compras:" if target_id == viewer_id else f"Compras de {target_id}:"
+    lines = [
+        f"{p.reward_name or p.reward_id} - {p.purchased_at:%Y-%m-%d}"
+        for p in page.entries
+    ]
+    buttons = []
+    if page.has_newer:
+        buttons.append(
+            InlineKeyboardButton(
+                text="\u25c0 M\u00e1s recientes",
+                callback_data=_purchase_cursor_data(target_id, "n", page.entries[0]),
+            )
+        )
+    if page.has_older:
+        buttons.append(
+            InlineKeyboardButton(
+                text="Anteriores \u25b6",
+                callback_data=_purchase_cursor_data(target_id, "o", page.entries[-1]),
+            )
+        )
+    markup = InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+    return title + "\n" + "\n".join(lines), markup
+
+
+@router.message(Command("purchases"))
 async def purchases_command(message: Message):
     """Show purchases made by the user or another user if admin."""
     parts = message.text.split(maxsplit=1)
@@ -243,8 +344,8 @@ async def purchases_command(message: Message):
             await message.answer("Uso: /purchases <user_id>")
             return
 
-    purchases = get_user_purchases(target_id)
-    if not purchases:
+    page = await run_db(get_purchase_page, target_id, limit=PURCHASES_PAGE_SIZE)
+    if not page.entries:
         text = (
             "A\u00fan no has comprado nada"
             if target_id == message.from_user.id
@@ -253,97 +354,357 @@ async def purchases_command(message: Message):
         await message.answer(text)
         return
 
-    rewards = {r.id: r for r in get_rewards()}
-    lines = [
-        f"{idx+1}. {rewards.get(p.reward_id).name if p.reward_id in rewards else p.reward_id} - {p.purchased_at:%Y-%m-%d}"
-        for idx, p in enumerate(purchases)
-    ]
-    prefix = "Tus" if target_id == message.from_user.id else f"Compras de {target_id}"
-    await message.answer(prefix + " compras:\n" + "\n".join(lines))
+    text, markup = _render_purchase_page(page, target_id, message.from_user.id)
+    await message.answer(text, reply_markup=markup)
+
+
+@router.callback_query(F.data.startswith("ph:"))
+async def cb_purchases_page(query: CallbackQuery):
+    """Move through the purchase history one page at a time."""
+    try:
+        _, target_str, direction, micros, purchase_id = query.data.split(":")
+        target_id = int(target_str)
+        cursor = (_EPOCH + timedelta(microseconds=int(micros)), int(purchase_id))
+    except ValueError:
+        await query.answer()
+        return
+    if target_id != query.from_user.id and query.from_user.id not in settings.admin_ids:
+        await query.answer("No autorizado")
+        return
+    if direction == "o":
+        page = await run_db(
+            get_purchase_page, target_id, before=cursor, limit=PURCHASES_PAGE_SIZE
+        )
+    else:
+        page = await run_db(
+            get_purchase_page, target_id, after=cursor, limit=PURCHASES_PAGE_SIZE
+        )
+    await query.answer()
+    if not page.entries:
+        return
+    text, markup = _render_purchase_page(page, target_id, query.from_user.id)
+    await query.message.edit_text(text, reply_markup=markup)
 
 
 
 
-@dp.message(~F.text.startswith("/"))
+@router.message(~F.text.startswith("/"))
 async def track_messages(message: Message):
     """Track user activity on every message."""
     if message.from_user and message.chat.type in {"private", "group", "supergroup"}:
-        record_user_message(message.from_user.id)
+        await run_db(record_user_message, message.from_user.id)
+
+
+_warning_lock = asyncio.Lock()
+
+
+async def expire_missions() -> int:
+    removed = await run_db(remove_expired_missions)
+    if removed:
+        logger.info("Removed %d expired missions", removed)
+    return removed
+
+
+async def send_expiry_warnings() -> int:
+    """Warn users about missions expiring within the next 24 hours."""
+    warned = 0
+    async with _warning_lock:
+        missions = await run_db(get_missions_near_expiry, 24)
+        for i in range(0, len(missions), WARNING_BATCH_SIZE):
+            report = await delivery.deliver_many(
+                (m.id, m.user_id, f"La misi\u00f3n '{m.description}' expirar\u00e1 pronto")
+                for m in missions[i : i + WARNING_BATCH_SIZE]
+            )
+            # a user who blocked the bot will never get the warning either
+            await run_db(mark_warnings_sent, report.delivered + report.rejected)
+            warned += len(report.delivered)
+    return warned
+
+
+async def _expire_due() -> None:
+    with metrics.job("expire_missions") as iteration:
+        iteration.items = await expire_missions()
+
+
+async def _warn_due() -> None:
+    with metrics.job("expiry_warnings") as iteration:
+        iteration.items = await send_expiry_warnings()
+
+
+# the hourly reconcile calls expire_missions/send_expiry_warnings directly,
+# under its own job name
+expiry = ExpiryEngine(on_expire=_expire_due, on_warn=_warn_due)
+
+# how often the leader re-reads upcoming expiries, which arms missions
+# created on other workers
+EXPIRY_RESYNC_INTERVAL = 60  # seconds
 
 
 async def scheduler():
-    """Background task to clean expired missions and warn users."""
+    """Reconcile expiries and warnings the timer heap may have missed."""
     while True:
-        remove_expired_missions()
-        missions = get_missions_near_expiry(24)
-        for m in missions:
-            await bot.send_message(
-                m.user_id,
-                f"La misi\u00f3n '{m.description}' expirar\u00e1 pronto",
-            )
-            mark_warning_sent(m.id)
         await asyncio.sleep(3600)
+        with metrics.job("reconcile") as iteration:
+            iteration.items += await expire_missions()
+            iteration.items += await send_expiry_warnings()
+
+
+async def activity_flush_scheduler():
+    """Periodically persist buffered message counters."""
+    while True:
+        await asyncio.sleep(ACTIVITY_FLUSH_INTERVAL)
+        try:
+            await run_db(flush_activity_buffer)
+        except Exception:
+            # the counts stay buffered and the next flush retries them
+            logger.exception("Flushing activity counters failed")
+
+
+def _reload_ranking() -> None:
+    ranking.track_updates()
+    ranking.load(get_user_points())
+
+
+async def ranking_refresh_scheduler():
+    """Rebuild the ranking so point changes made on other workers show up."""
+    while True:
+        await asyncio.sleep(settings.ranking_refresh_interval)
+        try:
+            await run_db(_reload_ranking)
+        except Exception:
+            logger.exception("Rebuilding the ranking failed")
+
+
+def _week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+async def _last_period(name: str, current: date) -> date:
+    """Return the last period ``name`` completed, starting from ``current``.
+
+    Periods are stored in the database so a worker that takes over the lease
+    catches up on periods the previous leader missed.
+    """
+    last = await run_db(get_job_period, name)
+    if last is None:
+        await run_db(set_job_period, name, current)
+        return current
+    return last
 
 
 async def daily_mission_scheduler():
     """Assign daily missions to all users once per day."""
-    last_day = datetime.utcnow().date()
     while True:
         current_day = datetime.utcnow().date()
-        if current_day != last_day:
-            assign_daily_missions(
-                "Misi\u00f3n diaria: env\u00eda 3 mensajes",
-                points=5,
-                goal=3,
-            )
-            last_day = current_day
+        if await _last_period("daily_missions", current_day) < current_day:
+            with metrics.job("daily_missions") as iteration:
+                report = await run_db(
+                    assign_daily_missions,
+                    "Misi\u00f3n diaria: env\u00eda 3 mensajes",
+                    points=5,
+                    goal=3,
+                )
+                logger.info(
+                    "Assigned %d daily missions in %.2fs", report.created, report.elapsed
+                )
+                iteration.items = report.created
+            await run_db(set_job_period, "daily_missions", current_day)
         await asyncio.sleep(3600)
 
 
 async def weekly_mission_scheduler():
     """Assign weekly missions to all users once per week."""
-    last_week = datetime.utcnow().date() - timedelta(days=datetime.utcnow().weekday())
     while True:
-        current_week = datetime.utcnow().date() - timedelta(days=datetime.utcnow().weekday())
-        if current_week != last_week:
-            assign_weekly_missions(
-                "Reto semanal: participa con 10 mensajes",
-                points=20,
-                goal=10,
-            )
-            last_week = current_week
+        current_week = _week_start(datetime.utcnow().date())
+        if await _last_period("weekly_missions", current_week) < current_week:
+            with metrics.job("weekly_missions") as iteration:
+                report = await run_db(
+                    assign_weekly_missions,
+                    "Reto semanal: participa con 10 mensajes",
+                    points=20,
+                    goal=10,
+                )
+                logger.info(
+                    "Assigned %d weekly missions in %.2fs", report.created, report.elapsed
+                )
+                iteration.items = report.created
+            await run_db(set_job_period, "weekly_missions", current_week)
         await asyncio.sleep(3600)
 
 
+async def close_week(week: date) -> int:
+    """Reward the most active users of ``week`` and send its summary.
+
+    The bonus and the closed week are committed together, so a retry after
+    a crash or a lost lease never pays the same week twice.
+    """
+    bonus = 10
+    rewarded = await run_db(
+        reward_top_weekly_users, week, points=bonus, job="weekly_summary"
+    )
+    if settings.notify_channel_id:
+        stats = await run_db(get_weekly_activity, 5, week=week)
+        lines = [f"{idx+1}. {s.user_id} - {s.message_count}" for idx, s in enumerate(stats)]
+        text = "Resumen de actividad semanal:\n" + ("\n".join(lines) if lines else "Sin actividad")
+        delivery.submit(settings.notify_channel_id, text)
+    await delivery.deliver_many(
+        (
+            user.id,
+            user.id,
+            f"\u00a1Felicidades! Fuiste de los m\u00e1s activos y ganas {bonus} puntos extra",
+        )
+        for user in rewarded
+    )
+    return len(rewarded)
+
+
+async def roll_over_activity() -> None:
+    report = await run_db(rollover_weekly_activity)
+    logger.info(
+        "Rolled over %d weeks: %d archived, %d pruned in %.2fs",
+        report.weeks,
+        report.archived,
+        report.pruned,
+        report.elapsed,
+    )
+
+
 async def weekly_summary_scheduler():
-    """Send weekly activity summary to the configured channel."""
-    last_week = datetime.utcnow().date() - timedelta(days=datetime.utcnow().weekday())
+    """Close every finished week once, including weeks a previous leader missed."""
+    # roll over on takeover too, in case the previous leader died before it
+    roll_over = True
     while True:
-        current_week = datetime.utcnow().date() - timedelta(days=datetime.utcnow().weekday())
-        if current_week != last_week:
-            if settings.notify_channel_id:
-                stats = get_weekly_activity(5, week=last_week)
-                lines = [f"{idx+1}. {s.user_id} - {s.message_count}" for idx, s in enumerate(stats)]
-                text = "Resumen de actividad semanal:\n" + ("\n".join(lines) if lines else "Sin actividad")
-                await bot.send_message(settings.notify_channel_id, text)
-            bonus = 10
-            rewarded = reward_top_weekly_users(last_week, points=bonus)
-            for user in rewarded:
-                await bot.send_message(
-                    user.id,
-                    f"\u00a1Felicidades! Fuiste de los m\u00e1s activos y ganas {bonus} puntos extra",
-                )
-            last_week = current_week
+        current_week = _week_start(datetime.utcnow().date())
+        week = await _last_period("weekly_summary", current_week)
+        while week < current_week:
+            with metrics.job("weekly_summary") as iteration:
+                iteration.items = await close_week(week)
+            week += timedelta(days=7)
+            roll_over = True
+        # only after every pending week is closed: the rollover prunes the
+        # raw rows the bonus is computed from
+        if roll_over:
+            await roll_over_activity()
+            roll_over = False
         await asyncio.sleep(3600)
 
 
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """Serve webhook updates until SIGINT/SIGTERM, then drain in-flight ones."""
+    server = WebhookServer(
+        dp,
+        bot,
+        path=settings.webhook_path,
+        secret_token=settings.webhook_secret,
+        max_in_flight=settings.webhook_max_in_flight,
+        max_per_user=settings.webhook_max_per_user,
+        drain_timeout=settings.webhook_drain_timeout,
+    )
+    await server.start(settings.webhook_host, settings.webhook_port)
+    await bot.set_webhook(
+        settings.webhook_url.rstrip("/") + settings.webhook_path,
+        secret_token=settings.webhook_secret or None,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        # the webhook stays registered: it is shared by every instance behind
+        # the load balancer, and polling deletes it before it starts
+        await server.stop()
+        await bot.session.close()
+
+
+async def resync_expiries():
+    """Arm deadlines due soon, including missions created on other workers."""
+    while True:
+        await asyncio.sleep(EXPIRY_RESYNC_INTERVAL)
+        horizon = expiry.warning_window + timedelta(seconds=2 * EXPIRY_RESYNC_INTERVAL)
+        expiry.schedule_many(
+            await run_db(get_mission_expiries, datetime.utcnow() + horizon)
+        )
+
+
+async def run_expiry_engine():
+    """Seed the timer heap from the database and fire deadlines.
+
+    Only the leader listens for new expiries, so other workers never grow a
+    heap that nothing pops.
+    """
+    expiry_listeners.append(expiry.schedule)
+    try:
+        expiry.schedule_many(await run_db(get_mission_expiries))
+        await asyncio.gather(expiry.run(), resync_expiries())
+    finally:
+        expiry_listeners.remove(expiry.schedule)
+        expiry.clear()
+
+
+# Jobs that must run on exactly one worker. They share a single lease so they
+# always run in the same process: the warning lock and the expiry listeners
+# only work within one process.
+LEADER_JOBS = (
+    run_expiry_engine,
+    scheduler,
+    daily_mission_scheduler,
+    weekly_mission_scheduler,
+    weekly_summary_scheduler,
+)
+
+
+async def run_leader_jobs():
+    """Run the leader jobs together; if one fails the lease restarts them all."""
+    tasks = [asyncio.create_task(job()) for job in LEADER_JOBS]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 async def main():
-    asyncio.create_task(scheduler())
-    asyncio.create_task(daily_mission_scheduler())
-    asyncio.create_task(weekly_mission_scheduler())
-    asyncio.create_task(weekly_summary_scheduler())
-    await dp.start_polling(bot)
+    bot, dp = create_app()
+    await run_db(init_db)
+    delivery.start()
+    metrics_runner = None
+    if settings.metrics_port:
+        metrics_runner = await metrics.start_metrics_server(
+            settings.metrics_host, settings.metrics_port
+        )
+    ranking.load(await run_db(get_user_points))
+    holder = worker_id()
+    tasks = [
+        asyncio.create_task(
+            LeaderLease("leader", holder, settings.lease_ttl).run(run_leader_jobs)
+        )
+    ]
+    # message counters are buffered per process, so every worker flushes its own
+    tasks.append(asyncio.create_task(activity_flush_scheduler()))
+    # each worker only sees its own point changes, so rebuild from the database
+    if settings.ranking_refresh_interval:
+        tasks.append(asyncio.create_task(ranking_refresh_scheduler()))
+    try:
+        if settings.webhook_url:
+            await run_webhook(bot, dp)
+        else:
+            # getUpdates fails with 409 Conflict while a webhook is registered
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # let the jobs release their leases so another worker takes over at once
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await delivery.stop(settings.delivery_drain_timeout)
+        await run_db(flush_activity_buffer)
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     asyncio.run(main())
@@ -4,9 +4,9 @@ from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKe
 
 from bot.config import settings
 from bot.database import (
+    run_db,
     get_or_create_user,
-    get_active_missions,
-    calculate_reward,
+    get_user_snapshot,
     get_user_achievements,
 )
 
@@ -35,28 +35,27 @@ async def user_menu(message: Message) -> None:
 
 @router.callback_query(F.data == "user_missions")
 async def cb_user_missions(query: CallbackQuery) -> None:
-    user = get_or_create_user(query.from_user.id)
-    missions = get_active_missions(user.id)
-    if not missions:
+    snapshot = await run_db(get_user_snapshot, query.from_user.id)
+    if not snapshot.missions:
         await query.message.edit_text("No tienes misiones activas")
         return
     lines = [
-        f"ID {m.id}: {m.description} [{m.progress}/{m.goal}] (+{calculate_reward(m)} pts)"
-        for m in missions
+        f"ID {m.id}: {m.description} [{m.progress}/{m.goal}] (+{m.reward} pts)"
+        for m in snapshot.missions
     ]
     await query.message.edit_text("Tus misiones:\n" + "\n".join(lines))
 
 
 @router.callback_query(F.data == "user_progress")
 async def cb_user_progress(query: CallbackQuery) -> None:
-    user = get_or_create_user(query.from_user.id)
+    user = await run_db(get_or_create_user, query.from_user.id)
     text = f"Nivel: {user.level}\nPuntos: {user.points}"
     await query.message.edit_text(text)
 
 
 @router.callback_query(F.data == "user_badges")
 async def cb_user_badges(query: CallbackQuery) -> None:
-    badges = get_user_achievements(query.from_user.id)
+    badges = await run_db(get_user_achievements, query.from_user.id)
     if not badges:
         await query.message.edit_text("A\u00fan no tienes insignias")
         return
@@ -66,11 +65,12 @@ async def cb_user_badges(query: CallbackQuery) -> None:
 
 @router.callback_query(F.data == "user_profile")
 async def cb_user_profile(query: CallbackQuery) -> None:
-    user = get_or_create_user(query.from_user.id)
-    badges = get_user_achievements(query.from_user.id)
+    snapshot = await run_db(get_user_snapshot, query.from_user.id)
     text = (
-        f"ID: {user.id}\nNivel: {user.level}\nPuntos: {user.points}\n"
-        f"Insignias: {len(badges)}"
+        f"ID: {snapshot.user_id}\nNivel: {snapshot.level}\nPuntos: {snapshot.points}\n"
+        f"Insignias: {snapshot.badge_count}\n"
+        f"Misiones activas: {len(snapshot.missions)}\n"
+        f"Mensajes esta semana: {snapshot.weekly_messages}"
     )
     await query.message.edit_text(text)
 
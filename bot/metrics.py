@@ -0,0 +1,236 @@
+"""Built-in metrics exposed in the Prometheus text format.
+
+Handler latency and errors are recorded by :class:`MetricsMiddleware`.
+Every SQL statement is counted and timed through engine events and
+attributed to the handler or job running at the time, which reaches the
+database worker threads through a context variable copied by ``run_db``.
+Background jobs report per-iteration duration and item counts with
+:func:`job`. :func:`start_metrics_server` serves everything on ``/metrics``.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name of the handler or job on whose behalf the current code runs
+current_operation: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_operation", default="other"
+)
+
+REGISTRY: list["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = buckets
+        # per label set: bucket counts, then sum and count
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            series = self._values.get(labels)
+            return int(series[-1]) if series else 0
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for labels, series in sorted(self._values.items()):
+            for bound, cumulative in zip(self.buckets, series):
+                extra = f'le="{bound}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, extra)} {cumulative}"
+                )
+            extra = 'le="+Inf"'
+            lines.append(
+                f"{self.name}_bucket{_format_labels(self.labelnames, labels, extra)} {series[-1]}"
+            )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {series[-2]}")
+            lines.append(f"{self.name}_count{label_text} {series[-1]}")
+        return lines
+
+
+handler_seconds = Histogram(
+    "bot_handler_seconds", "Time spent in update handlers.", ("handler",)
+)
+handler_errors = Counter(
+    "bot_handler_errors_total", "Update handlers that raised.", ("handler",)
+)
+db_queries = Counter(
+    "bot_db_queries_total", "SQL statements executed.", ("operation",)
+)
+db_seconds = Histogram(
+    "bot_db_query_seconds", "Time spent executing SQL statements.", ("operation",)
+)
+job_seconds = Histogram(
+    "bot_job_seconds",
+    "Duration of background job iterations.",
+    ("job",),
+    buckets=DEFAULT_BUCKETS + (30.0, 60.0, 300.0),
+)
+job_items = Counter(
+    "bot_job_items_total", "Items processed by background jobs.", ("job",)
+)
+job_last_run = Gauge(
+    "bot_job_last_run_timestamp_seconds", "Unix time a job last finished.", ("job",)
+)
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Inner middleware timing each handler and counting its failures."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else "unknown"
+        token = current_operation.set(name)
+        began = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors.inc(name)
+            raise
+        finally:
+            handler_seconds.observe(name, value=time.perf_counter() - began)
+            current_operation.reset(token)
+
+
+class JobIteration:
+    def __init__(self) -> None:
+        self.items = 0
+
+
+@contextmanager
+def job(name: str) -> Iterator[JobIteration]:
+    """Time one iteration of a background job; set ``items`` on the result."""
+    iteration = JobIteration()
+    token = current_operation.set(name)
+    began = time.perf_counter()
+    try:
+        yield iteration
+    finally:
+        job_seconds.observe(name, value=time.perf_counter() - began)
+        job_items.inc(name, amount=iteration.items)
+        job_last_run.set(name, value=time.time())
+        current_operation.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started_at = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started_at
+    operation = current_operation.get()
+    db_queries.inc(operation)
+    db_seconds.observe(operation, value=elapsed)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
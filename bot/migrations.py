@@ -0,0 +1,252 @@
+"""Versioned schema migrations applied at startup.
+
+Each migration upgrades an existing database in place and is recorded in the
+``schema_migration`` table. Fresh databases are created from the models and
+stamped with every known version without running the migrations.
+"""
+
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+
+Migration = tuple[int, str, Callable[[Connection], None]]
+
+MIGRATIONS: list[Migration] = []
+
+_metadata = MetaData()
+schema_migration = Table(
+    "schema_migration",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def migration(version: int, description: str):
+    """Register a migration function for the given schema version."""
+
+    def decorator(func: Callable[[Connection], None]):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+
+    return decorator
+
+
+def _applied_versions(conn: Connection) -> set[int]:
+    return set(conn.execute(select(schema_migration.c.version)).scalars())
+
+
+def _stamp(conn: Connection, version: int, description: str) -> None:
+    conn.execute(
+        schema_migration.insert().values(
+            version=version, description=description, applied_at=datetime.utcnow()
+        )
+    )
+
+
+def run_migrations(engine: Engine, metadata: MetaData) -> list[int]:
+    """Create missing tables and apply pending migrations.
+
+    Returns the versions that were applied.
+    """
+    fresh = not inspect(engine).has_table("user")
+    metadata.create_all(engine)
+    _metadata.create_all(engine)
+    applied: list[int] = []
+    with engine.begin() as conn:
+        done = _applied_versions(conn)
+        for version, description, func in MIGRATIONS:
+            if version in done:
+                continue
+            if not fresh:
+                func(conn)
+                applied.append(version)
+            _stamp(conn, version, description)
+    return applied
+
+
+@migration(1, "secondary indexes and unique weekly activity")
+def _secondary_indexes(conn: Connection) -> None:
+    # merge duplicate weekly counters before enforcing uniqueness
+    conn.execute(
+        text(
+            """
+            UPDATE weeklyactivity SET message_count = (
+                SELECT SUM(w.message_count) FROM weeklyactivity AS w
+                WHERE w.user_id = weeklyactivity.user_id
+                  AND w.week_start = weeklyactivity.week_start
+            )
+            WHERE id IN (
+                SELECT MIN(id) FROM weeklyactivity
+                GROUP BY user_id, week_start HAVING COUNT(*) > 1
+            )
+            """
+        )
+    )
+    conn.execute(
+        text(
+            """
+            DELETE FROM weeklyactivity WHERE id NOT IN (
+                SELECT MIN(id) FROM weeklyactivity GROUP BY user_id, week_start
+            )
+            """
+        )
+    )
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS ix_mission_user_type_created"
+        " ON mission (user_id, type, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_mission_expires_at ON mission (expires_at)",
+        "CREATE INDEX IF NOT EXISTS ix_mission_warning_expires"
+        " ON mission (warning_sent, expires_at)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_weeklyactivity_user_week"
+        " ON weeklyactivity (user_id, week_start)",
+        "CREATE INDEX IF NOT EXISTS ix_weeklyactivity_week_count"
+        " ON weeklyactivity (week_start, message_count)",
+        "CREATE INDEX IF NOT EXISTS ix_purchase_user_id ON purchase (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_purchase_purchased_at ON purchase (purchased_at)",
+        "CREATE INDEX IF NOT EXISTS ix_achievement_user_id ON achievement (user_id)",
+    ):
+        conn.execute(text(statement))
+
+
+@migration(2, "opening balances for the points ledger")
+def _opening_balances(conn: Connection) -> None:
+    conn.execute(
+        text(
+            """
+            INSERT INTO pointsledger (user_id, delta, balance, reason, created_at)
+            SELECT id, points, points, 'opening', :now FROM "user" WHERE points != 0
+            """
+        ),
+        {"now": datetime.utcnow()},
+    )
+
+
+@migration(3, "unique achievements and a badge counter")
+def _normalized_badges(conn: Connection) -> None:
+    conn.execute(
+        text(
+            """
+            DELETE FROM achievement WHERE id NOT IN (
+                SELECT MIN(id) FROM achievement GROUP BY user_id, name
+            )
+            """
+        )
+    )
+    conn.execute(
+        text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_achievement_user_name"
+            " ON achievement (user_id, name)"
+        )
+    )
+    # the unique index leads with user_id and replaces the single-column one
+    conn.execute(text("DROP INDEX IF EXISTS ix_achievement_user_id"))
+    conn.execute(
+        text('ALTER TABLE "user" ADD COLUMN badge_count INTEGER NOT NULL DEFAULT 0')
+    )
+    conn.execute(
+        text(
+            """
+            UPDATE "user" SET badge_count = (
+                SELECT COUNT(*) FROM achievement WHERE achievement.user_id = "user".id
+            )
+            """
+        )
+    )
+    # badges now live only in the achievement table
+    conn.execute(text('ALTER TABLE "user" DROP COLUMN badges'))
+
+
+@migration(4, "purchase history index for keyset pagination")
+def _purchase_history_index(conn: Connection) -> None:
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_purchase_user_time"
+            " ON purchase (user_id, purchased_at, id)"
+        )
+    )
+    conn.execute(text("DROP INDEX IF EXISTS ix_purchase_user_id"))
+
+
+@migration(5, "monthly purchase rollups")
+def _monthly_purchase_rollups(conn: Connection) -> None:
+    # month keys use the same text layout SQLAlchemy stores datetimes in
+    conn.execute(
+        text(
+            """
+            INSERT INTO monthlypurchaserollup (month, reward_id, purchases)
+            SELECT strftime('%Y-%m-01 00:00:00.000000', purchased_at), reward_id, COUNT(*)
+            FROM purchase
+            GROUP BY strftime('%Y-%m-01 00:00:00.000000', purchased_at), reward_id
+            """
+        )
+    )
+
+
+@migration(6, "mission templates shared by per-user missions")
+def _mission_templates(conn: Connection) -> None:
+    # missiontemplate was created from the models; fill it with every
+    # distinct definition, computing the reward like calculate_reward()
+    conn.execute(
+        text(
+            """
+            INSERT OR IGNORE INTO missiontemplate (description, points, type, goal, reward)
+            SELECT DISTINCT description, points, type, goal,
+                   points * MAX(1, goal) * (CASE WHEN type = 'hard' THEN 2 ELSE 1 END)
+            FROM mission
+            """
+        )
+    )
+    # SQLite cannot drop several columns with foreign keys, so rebuild the table
+    conn.execute(
+        text(
+            """
+            CREATE TABLE mission_new (
+                id INTEGER NOT NULL,
+                user_id INTEGER,
+                template_id INTEGER NOT NULL,
+                progress INTEGER NOT NULL,
+                expires_at DATETIME,
+                warning_sent BOOLEAN NOT NULL,
+                PRIMARY KEY (id),
+                FOREIGN KEY(user_id) REFERENCES user (id),
+                FOREIGN KEY(template_id) REFERENCES missiontemplate (id)
+            )
+            """
+        )
+    )
+    conn.execute(
+        text(
+            """
+            INSERT INTO mission_new (id, user_id, template_id, progress, expires_at, warning_sent)
+            SELECT m.id, m.user_id, t.id, m.progress, m.expires_at, m.warning_sent
+            FROM mission AS m
+            JOIN missiontemplate AS t
+              ON t.type = m.type AND t.description = m.description
+             AND t.points = m.points AND t.goal = m.goal
+            """
+        )
+    )
+    conn.execute(text("DROP TABLE mission"))
+    conn.execute(text("ALTER TABLE mission_new RENAME TO mission"))
+    for statement in (
+        "CREATE INDEX ix_mission_user_template_expires"
+        " ON mission (user_id, template_id, expires_at)",
+        "CREATE INDEX ix_mission_warning_expires ON mission (warning_sent, expires_at)",
+        "CREATE INDEX ix_mission_expires_at ON mission (expires_at)",
+    ):
+        conn.execute(text(statement))
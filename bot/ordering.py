@@ -0,0 +1,92 @@
+"""Per-user ordering of update handling.
+
+Updates are sharded by the id of the user who sent them. Each shard is a FIFO
+lock, so one user's updates are handled strictly in arrival order and never
+interleave their read-modify-write cycles, while updates of different users
+run in parallel up to a global limit.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from bot.config import settings
+
+
+@dataclass
+class _Shard:
+    lock: asyncio.Lock
+    depth: int = 0  # updates queued or running for this user
+
+
+class UserOrderingMiddleware(BaseMiddleware):
+    """Outer update middleware serialising each user's updates."""
+
+    def __init__(self, limit: int = 64) -> None:
+        self.limit = limit
+        self._slots = asyncio.Semaphore(limit)
+        self._shards: dict[int, _Shard] = {}
+        self.running = 0
+        self.waiting = 0
+        self.handled = 0
+        self.peak_depth = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        if user is None:
+            return await self._run(handler, event, data)
+        shard = self._shards.get(user.id)
+        if shard is None:
+            shard = self._shards[user.id] = _Shard(asyncio.Lock())
+        shard.depth += 1
+        self.peak_depth = max(self.peak_depth, shard.depth)
+        try:
+            # take the user's turn first so a busy user holds at most one slot
+            async with shard.lock:
+                return await self._run(handler, event, data)
+        finally:
+            shard.depth -= 1
+            if shard.depth == 0:
+                del self._shards[user.id]
+
+    async def _run(self, handler, event, data) -> Any:
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            return await handler(event, data)
+        finally:
+            self.running -= 1
+            self.handled += 1
+            self._slots.release()
+
+    def stats(self, top: int = 5) -> dict[str, Any]:
+        depths = sorted(
+            ((user_id, shard.depth) for user_id, shard in self._shards.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return {
+            "limit": self.limit,
+            "running": self.running,
+            # updates waiting for a global slot or for their user's turn
+            "queued": self.waiting + sum(depth - 1 for _, depth in depths),
+            "users": len(depths),
+            "handled": self.handled,
+            "peak_depth": self.peak_depth,
+            "deepest": depths[:top],
+        }
+
+
+ordering = UserOrderingMiddleware(settings.update_concurrency)
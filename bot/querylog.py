@@ -0,0 +1,140 @@
+"""Per-operation SQL statement logging for query budgets and N+1 detection.
+
+:func:`count_queries` records every statement executed inside it, including
+statements run by ``run_db`` workers, together with the line in ``bot/``
+that issued it. Statements are grouped by normalized text, so a loop that
+runs the same query once per row shows up as one statement with a high
+count. :class:`QueryBudgetMiddleware` samples handlers in production and
+logs those above the budget; tests use :func:`assert_max_queries`.
+"""
+
+import contextvars
+import logging
+import random
+import re
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterator
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_PACKAGE_DIR = str(Path(__file__).resolve().parent)
+_THIS_FILE = str(Path(__file__).resolve())
+
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """Reduce a statement to its shape: literals and IN lists become ``?``."""
+    statement = _STRING.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _SPACE.sub(" ", statement).strip()
+    return _IN_LIST.sub("(?...)", statement)
+
+
+def _call_site() -> str:
+    """Innermost frame inside the bot package that is not this module."""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(_PACKAGE_DIR) and frame.filename != _THIS_FILE:
+            return f"{Path(frame.filename).name}:{frame.lineno} ({frame.name})"
+    return "?"
+
+
+@dataclass
+class QueryLog:
+    statements: list[tuple[str, str]] = field(default_factory=list)  # (sql, call site)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def grouped(self) -> list[tuple[str, int, list[str]]]:
+        """Return ``(statement, count, call sites)`` with the most frequent first."""
+        counts = Counter(sql for sql, _ in self.statements)
+        sites: dict[str, list[str]] = {}
+        for sql, site in self.statements:
+            if site not in sites.setdefault(sql, []):
+                sites[sql].append(site)
+        return [(sql, n, sites[sql]) for sql, n in counts.most_common()]
+
+    def report(self, limit: int = 5) -> str:
+        lines = [f"{self.count} queries"]
+        for sql, n, sites in self.grouped()[:limit]:
+            lines.append(f"  {n}x {sql[:200]}")
+            lines.extend(f"      at {site}" for site in sites[:3])
+        return "\n".join(lines)
+
+
+_active_log: contextvars.ContextVar[QueryLog | None] = contextvars.ContextVar(
+    "active_query_log", default=None
+)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    log = _active_log.get()
+    if log is not None:
+        log.statements.append((normalize(statement), _call_site()))
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryLog]:
+    """Record the statements executed in this context, run_db workers included."""
+    log = QueryLog()
+    token = _active_log.set(log)
+    try:
+        yield log
+    finally:
+        _active_log.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryLog]:
+    """Fail when the block runs more than ``limit`` statements."""
+    with count_queries() as log:
+        yield log
+    if log.count > limit:
+        raise AssertionError(f"expected at most {limit} queries, got {log.report()}")
+
+
+class QueryBudgetMiddleware(BaseMiddleware):
+    """Inner middleware logging sampled handlers that exceed the query budget."""
+
+    def __init__(self, budget: int = 20, sample_rate: float = 0.01) -> None:
+        self.budget = budget
+        self.sample_rate = sample_rate
+        self.over_budget = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if random.random() >= self.sample_rate:
+            return await handler(event, data)
+        with count_queries() as log:
+            try:
+                return await handler(event, data)
+            finally:
+                if log.count > self.budget:
+                    self.over_budget += 1
+                    handler_object = data.get("handler")
+                    name = handler_object.callback.__name__ if handler_object else "unknown"
+                    logger.warning(
+                        "Handler %s exceeded its query budget of %d: %s",
+                        name,
+                        self.budget,
+                        log.report(),
+                    )
@@ -0,0 +1,191 @@
+"""In-memory points ranking with logarithmic rank lookups.
+
+Users are kept in a size-augmented treap ordered by ``(-points, user_id)``,
+so the top of the ranking is the leftmost path and a user's position is the
+number of keys in front of theirs.
+"""
+
+import random
+import threading
+from collections import deque
+from typing import Iterable
+
+
+class _Node:
+    __slots__ = ("key", "priority", "left", "right", "size")
+
+    def __init__(self, key: tuple[int, int], priority: float) -> None:
+        self.key = key
+        self.priority = priority
+        self.left: "_Node | None" = None
+        self.right: "_Node | None" = None
+        self.size = 1
+
+    def update(self) -> None:
+        self.size = 1 + _size(self.left) + _size(self.right)
+
+
+def _size(node: _Node | None) -> int:
+    return node.size if node else 0
+
+
+def _split(node: _Node | None, key: tuple) -> tuple[_Node | None, _Node | None]:
+    """Split into keys ``< key`` and keys ``>= key``."""
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        node.update()
+        return node, right
+    left, right = _split(node.left, key)
+    node.left = right
+    node.update()
+    return left, node
+
+
+def _merge(left: _Node | None, right: _Node | None) -> _Node | None:
+    """Join two treaps where every key of ``left`` precedes ``right``."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+class RankingIndex:
+    """Order-statistic index of users by points."""
+
+    def __init__(self) -> None:
+        self._root: _Node | None = None
+        self._points: dict[int, int] = {}
+        self._lock = threading.Lock()
+        # updates seen since track_updates(), replayed by the next load()
+        self._pending: dict[int, int | None] | None = None
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def track_updates(self) -> None:
+        """Remember updates from now on so the next :meth:`load` keeps them.
+
+        Call it before reading the rows to load, so changes that land while
+        they are read are not rolled back to the older snapshot.
+        """
+        with self._lock:
+            self._pending = {}
+
+    def load(self, rows: Iterable[tuple[int, int]]) -> None:
+        """Rebuild the index from ``(user_id, points)`` pairs in O(n log n)."""
+        points = dict(rows)
+        keys = sorted((-p, user_id) for user_id, p in points.items())
+        root = self._build(keys)
+        with self._lock:
+            pending, self._pending = self._pending or {}, None
+            self._points = points
+            self._root = root
+            for user_id, value in pending.items():
+                if value is None:
+                    self._remove_user(user_id)
+                else:
+                    self._set(user_id, value)
+            self.loaded = True
+
+    @staticmethod
+    def _build(keys: list[tuple[int, int]]) -> _Node | None:
+        def build(lo: int, hi: int) -> _Node | None:
+            if lo >= hi:
+                return None
+            mid = (lo + hi) // 2
+            node = _Node(keys[mid], 0.0)
+            node.left = build(lo, mid)
+            node.right = build(mid + 1, hi)
+            node.update()
+            return node
+
+        root = build(0, len(keys))
+        # hand out random priorities level by level so parents outrank children
+        priorities = sorted((random.random() for _ in keys), reverse=True)
+        queue = deque([root] if root else [])
+        for priority in priorities:
+            node = queue.popleft()
+            node.priority = priority
+            queue.extend(child for child in (node.left, node.right) if child)
+        return root
+
+    def update(self, user_id: int, points: int) -> None:
+        """Insert a user or move them to their new points total."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending[user_id] = points
+            self._set(user_id, points)
+
+    def remove(self, user_id: int) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending[user_id] = None
+            self._remove_user(user_id)
+
+    def _set(self, user_id: int, points: int) -> None:
+        old = self._points.get(user_id)
+        if old == points:
+            return
+        if old is not None:
+            self._remove((-old, user_id))
+        self._points[user_id] = points
+        key = (-points, user_id)
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key, random.random())), right)
+
+    def _remove_user(self, user_id: int) -> None:
+        old = self._points.pop(user_id, None)
+        if old is not None:
+            self._remove((-old, user_id))
+
+    def _remove(self, key: tuple[int, int]) -> None:
+        left, rest = _split(self._root, key)
+        _, right = _split(rest, (key[0], key[1] + 1))
+        self._root = _merge(left, right)
+
+    def top(self, n: int) -> list[tuple[int, int]]:
+        """Return the first ``n`` ``(user_id, points)`` pairs."""
+        result: list[tuple[int, int]] = []
+        with self._lock:
+            stack: list[_Node] = []
+            node = self._root
+            while (stack or node) and len(result) < n:
+                while node:
+                    stack.append(node)
+                    node = node.left
+                node = stack.pop()
+                result.append((node.key[1], -node.key[0]))
+                node = node.right
+        return result
+
+    def rank(self, user_id: int) -> tuple[int, int] | None:
+        """Return ``(rank, total)`` for a user; ties share the same rank."""
+        with self._lock:
+            points = self._points.get(user_id)
+            if points is None:
+                return None
+            # count users with strictly more points
+            bound = (-points,)
+            ahead = 0
+            node = self._root
+            while node:
+                if node.key < bound:
+                    ahead += _size(node.left) + 1
+                    node = node.right
+                else:
+                    node = node.left
+            return ahead + 1, len(self._points)
+
+
+ranking = RankingIndex()
@@ -0,0 +1,168 @@
+"""Webhook ingestion of Telegram updates.
+
+An aiohttp application accepts the updates Telegram POSTs to the webhook
+path and feeds them into the dispatcher. At most ``max_in_flight`` updates
+are processed at once, and at most ``max_per_user`` of them come from the
+same user, whose updates run one at a time anyway; further requests wait
+for a slot, which slows Telegram's delivery down instead of queueing
+without bound. ``/healthz`` reports the load and turns unhealthy while the
+server drains on shutdown.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+@dataclass
+class _UserSlots:
+    slots: asyncio.Semaphore
+    users: int = 0  # requests holding or waiting for one of the slots
+
+
+def _user_id(update: Update) -> int | None:
+    try:
+        user = getattr(update.event, "from_user", None)
+    except LookupError:
+        return None
+    return user.id if user is not None else None
+
+
+class WebhookServer:
+    """Feeds webhook updates into a dispatcher with bounded concurrency."""
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        path: str = "/webhook",
+        secret_token: str = "",
+        max_in_flight: int = 100,
+        max_per_user: int = 4,
+        drain_timeout: float = 30.0,
+    ) -> None:
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.max_in_flight = max_in_flight
+        self.max_per_user = max_per_user
+        self.drain_timeout = drain_timeout
+        self.draining = False
+        self.received = 0
+        self.failed = 0
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._user_slots: dict[int, _UserSlots] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get("/healthz", self.handle_health)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret_token and request.headers.get(SECRET_HEADER) != self.secret_token:
+            return web.Response(status=401)
+        if self.draining:
+            # Telegram retries the update, possibly on another instance
+            return web.Response(status=503)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except ValueError:
+            return web.Response(status=400)
+        user_id = _user_id(update)
+        # a user's own slot first, so one busy user cannot take every global slot
+        await self._acquire_user(user_id)
+        try:
+            await self._slots.acquire()
+        except BaseException:
+            self._release_user(user_id)
+            raise
+        self.received += 1
+        task = asyncio.create_task(self._process(update, user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _acquire_user(self, user_id: int | None) -> None:
+        if user_id is None:
+            return
+        user = self._user_slots.get(user_id)
+        if user is None:
+            user = self._user_slots[user_id] = _UserSlots(asyncio.Semaphore(self.max_per_user))
+        user.users += 1
+        try:
+            await user.slots.acquire()
+        except BaseException:
+            self._forget_user(user_id, user)
+            raise
+
+    def _release_user(self, user_id: int | None) -> None:
+        if user_id is None:
+            return
+        user = self._user_slots[user_id]
+        user.slots.release()
+        self._forget_user(user_id, user)
+
+    def _forget_user(self, user_id: int, user: _UserSlots) -> None:
+        user.users -= 1
+        if user.users == 0:
+            del self._user_slots[user_id]
+
+    async def _process(self, update: Update, user_id: int | None) -> None:
+        try:
+            await self.dispatcher.feed_update(self.bot, update)
+        except Exception:
+            self.failed += 1
+            logger.exception("Failed to process update %s", update.update_id)
+        finally:
+            self._slots.release()
+            self._release_user(user_id)
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        body: dict[str, Any] = {
+            "status": "draining" if self.draining else "ok",
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "received": self.received,
+            "failed": self.failed,
+        }
+        return web.json_response(body, status=503 if self.draining else 200)
+
+    async def start(self, host: str, port: int) -> None:
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info("Listening for webhook updates on %s:%d%s", host, port, self.path)
+
+    async def drain(self) -> None:
+        """Stop accepting updates and wait for in-flight ones to finish."""
+        self.draining = True
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(set(self._tasks), timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("Cancelled %d updates still running after drain", len(pending))
+
+    async def stop(self) -> None:
+        await self.drain()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
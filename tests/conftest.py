@@ -0,0 +1,22 @@
+import os, sys, pathlib, shutil, tempfile
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+# Point the bot at a throwaway database before any test imports ``bot``.
+_DB_DIR = tempfile.mkdtemp(prefix="bot-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_DIR}/test.db"
+
+import pytest
+
+from bot.querylog import assert_max_queries
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_DB_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def max_queries():
+    """``with max_queries(n):`` fails when the block runs more than n statements."""
+    return assert_max_queries
@@ -0,0 +1,78 @@
+-- Schema created by the first release, before any migration.
+CREATE TABLE user (
+    id INTEGER NOT NULL,
+    points INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    badges VARCHAR NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE TABLE reward (
+    id INTEGER NOT NULL,
+    name VARCHAR NOT NULL,
+    description VARCHAR NOT NULL,
+    cost INTEGER NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE TABLE mission (
+    id INTEGER NOT NULL,
+    user_id INTEGER,
+    description VARCHAR NOT NULL,
+    points INTEGER NOT NULL,
+    type VARCHAR NOT NULL,
+    goal INTEGER NOT NULL,
+    progress INTEGER NOT NULL,
+    expires_at DATETIME,
+    warning_sent BOOLEAN NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id)
+);
+CREATE TABLE achievement (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    name VARCHAR NOT NULL,
+    description VARCHAR NOT NULL,
+    awarded_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id)
+);
+CREATE TABLE purchase (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    reward_id INTEGER NOT NULL,
+    purchased_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id),
+    FOREIGN KEY(reward_id) REFERENCES reward (id)
+);
+CREATE TABLE weeklyactivity (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    week_start DATETIME NOT NULL,
+    message_count INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id)
+);
+
+-- rows written by the baseline code, including the duplicates it allowed
+INSERT INTO user (id, points, level, badges) VALUES
+    (1, 120, 2, 'Primer paso'),
+    (2, 0, 1, '');
+INSERT INTO reward (id, name, description, cost) VALUES
+    (1, 'Sticker', 'Pack de stickers', 10);
+INSERT INTO mission (id, user_id, description, points, type, goal, progress, expires_at, warning_sent, created_at) VALUES
+    (1, 1, 'Envia 3 mensajes', 5, 'daily', 3, 1, '2024-01-16 00:00:00.000000', 0, '2024-01-15 00:00:00.000000'),
+    (2, 2, 'Envia 3 mensajes', 5, 'daily', 3, 0, '2024-01-16 00:00:00.000000', 1, '2024-01-15 00:00:00.000000'),
+    (3, 1, 'Reto dificil', 4, 'hard', 2, 0, NULL, 0, '2024-01-10 00:00:00.000000'),
+    (4, NULL, 'Global', 1, 'generic', 1, 0, NULL, 0, '2024-01-10 00:00:00.000000');
+INSERT INTO achievement (id, user_id, name, description, awarded_at) VALUES
+    (1, 1, 'Primer paso', 'Completa una mision', '2024-01-10 00:00:00.000000'),
+    (2, 1, 'Primer paso', 'Completa una mision', '2024-01-11 00:00:00.000000');
+INSERT INTO purchase (id, user_id, reward_id, purchased_at) VALUES
+    (1, 1, 1, '2024-01-15 10:00:00.000000'),
+    (2, 2, 1, '2024-01-20 10:00:00.000000'),
+    (3, 1, 1, '2024-02-01 10:00:00.000000');
+INSERT INTO weeklyactivity (id, user_id, week_start, message_count) VALUES
+    (1, 1, '2024-01-15 00:00:00.000000', 2),
+    (2, 1, '2024-01-15 00:00:00.000000', 3),
+    (3, 2, '2024-01-15 00:00:00.000000', 4);
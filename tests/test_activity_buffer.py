@@ -0,0 +1,64 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import asyncio
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from bot import database as db
+from bot import main as main_module
+
+
+def counts(user_id):
+    stat = db.get_user_weekly_stat(user_id)
+    top = {s.user_id: s.message_count for s in db.get_weekly_activity(limit=1000)}
+    return (stat.message_count if stat else 0), top.get(user_id, 0)
+
+
+def locked_session():
+    raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+
+def test_reads_include_unflushed_counts_and_failed_flush_keeps_them(monkeypatch):
+    db.get_or_create_user(9700)
+    db.flush_activity_buffer()
+    for _ in range(3):
+        db.record_user_message(9700)
+    assert counts(9700) == (3, 3)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db, 'get_session', locked_session)
+        with pytest.raises(OperationalError):
+            db.flush_activity_buffer()
+    db.record_user_message(9700)
+    assert counts(9700) == (4, 4)
+
+    assert db.flush_activity_buffer() >= 1
+    assert counts(9700) == (4, 4)  # flushed counts are not counted twice
+    db.record_user_message(9700)
+    assert counts(9700) == (5, 5)
+
+
+def test_flush_scheduler_survives_a_failed_flush(monkeypatch):
+    flushes = []
+
+    def flaky_flush():
+        flushes.append(len(flushes))
+        if len(flushes) == 1:
+            locked_session()
+
+    async def tick(seconds):
+        if len(flushes) >= 2:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(main_module, 'flush_activity_buffer', flaky_flush)
+    monkeypatch.setattr(main_module.asyncio, 'sleep', tick)
+
+    async def go():
+        await asyncio.gather(main_module.activity_flush_scheduler(), return_exceptions=True)
+
+    asyncio.run(go())
+    assert flushes == [0, 1]
@@ -0,0 +1,64 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from datetime import date, datetime
+
+from sqlalchemy import insert, select
+
+from bot import database as db
+
+WEEK_A = datetime(2020, 1, 6)
+WEEK_B = datetime(2020, 1, 13)
+WEEK_C = datetime(2020, 1, 20)
+
+
+def seed(week_start, counts):
+    for user_id in counts:
+        db.get_or_create_user(user_id)
+    with db.get_session() as session:
+        session.execute(
+            insert(db.WeeklyActivity),
+            [
+                {"user_id": user_id, "week_start": week_start, "message_count": count}
+                for user_id, count in counts.items()
+            ],
+        )
+        session.commit()
+
+
+def raw_weeks():
+    with db.get_session() as session:
+        statement = select(db.WeeklyActivity.week_start).where(
+            db.WeeklyActivity.week_start < datetime(2021, 1, 1)
+        )
+        return sorted(set(session.scalars(statement).all()))
+
+
+def test_rollover_is_idempotent_and_only_prunes_archived_weeks(monkeypatch):
+    seed(WEEK_A, {9300: 5, 9301: 3, 9302: 1})
+    seed(WEEK_B, {9300: 2, 9302: 4})
+
+    report = db.rollover_weekly_activity(today=date(2020, 1, 20), top_n=2, retention_weeks=0)
+    assert (report.weeks, report.archived, report.pruned) == (2, 4, 5)
+    assert raw_weeks() == []
+    assert [(s.user_id, s.message_count) for s in db.get_weekly_activity(5, week=WEEK_A.date())] == [
+        (9300, 5),
+        (9301, 3),
+    ]
+    lifetime = db.get_lifetime_activity(9300)
+    assert (lifetime.message_count, lifetime.weeks_active) == (7, 2)
+
+    # a second run finds nothing left to fold or prune
+    again = db.rollover_weekly_activity(today=date(2020, 1, 20), top_n=2, retention_weeks=0)
+    assert (again.weeks, again.archived, again.pruned) == (0, 0, 0)
+    lifetime = db.get_lifetime_activity(9300)
+    assert (lifetime.message_count, lifetime.weeks_active) == (7, 2)
+
+    # a week whose archive was never written keeps its raw rows
+    seed(WEEK_C, {9301: 8})
+    monkeypatch.setattr(db, '_archive_week', lambda session, week_start, top_n: 0)
+    report = db.rollover_weekly_activity(today=date(2020, 1, 27), top_n=2, retention_weeks=0)
+    assert report.pruned == 0
+    assert raw_weeks() == [WEEK_C]
@@ -4,6 +4,7 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
 import asyncio
+from datetime import datetime
 from types import SimpleNamespace
 
 import pytest
@@ -14,6 +15,7 @@ from bot.admin import (
     award_command,
     add_reward_command,
     monthly_purchases_command,
+    rebuild_rollups_command,
 )
 from bot import admin as admin_module
 
@@ -120,3 +122,18 @@ def test_monthly_purchases_empty(monkeypatch):
     msg = FakeMessage("/monthsummary 2023-05")
     run(monthly_purchases_command(msg))
     assert msg.responses == ["Sin compras registradas"]
+
+
+def test_rebuild_rollups_command(monkeypatch):
+    calls = []
+
+    def fake_rebuild(month):
+        calls.append(month)
+        return 1
+
+    monkeypatch.setattr(admin_module, 'rebuild_monthly_rollups', fake_rebuild)
+
+    msg = FakeMessage("/rebuildrollups 2023-05")
+    run(rebuild_rollups_command(msg))
+    assert calls == [datetime(2023, 5, 1).date()]
+    assert msg.responses == ["Res\u00famenes mensuales recalculados: 1"]
@@ -0,0 +1,39 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from bot import database as db
+from bot.cache import LRUCache
+
+
+def test_fill_is_cancelled_by_a_concurrent_write():
+    cache = LRUCache(maxsize=4)
+    token = cache.reserve("a")
+    cache.discard("a")  # written while "a" was being loaded
+    assert not cache.fill("a", token, "stale")
+    assert cache.get("a") is None
+
+    token = cache.reserve("a")
+    assert cache.fill("a", token, "fresh")
+    assert cache.get("a") == "fresh"
+    # a token is used once
+    assert not cache.fill("a", token, "again")
+
+
+def test_points_change_during_load_is_not_lost(monkeypatch):
+    db.get_or_create_user(9100)
+    db.user_cache.clear()
+    real_snapshot = db._user_snapshot
+
+    def snapshot_after_concurrent_credit(user, **changes):
+        # another run_db thread commits and publishes a change mid-load
+        if not changes:
+            db._points_changed(9100, 99)
+        return real_snapshot(user, **changes)
+
+    monkeypatch.setattr(db, '_user_snapshot', snapshot_after_concurrent_credit)
+    with db.get_session() as session:
+        db._load_or_create_user(session, 9100)
+    monkeypatch.undo()
+    assert db.user_cache.peek(9100) is None
@@ -0,0 +1,32 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from bot import database as db
+from bot.catalog import cached_catalog, load_catalog
+
+
+def test_add_reward_invalidates_the_catalog():
+    catalog = load_catalog()
+    assert cached_catalog() is catalog
+    assert load_catalog() is catalog
+
+    reward = db.add_reward("Catalog hat", "test", 7)
+    assert cached_catalog() is None
+    fresh = load_catalog()
+    assert fresh.version > catalog.version
+    assert fresh.rewards[reward.id].cost == 7
+    assert f"{reward.id}. Catalog hat - 7 pts" in fresh.store_text
+
+
+def test_redeem_with_the_catalog_copy():
+    db.get_or_create_user(9800)
+    with db.get_session() as session:
+        db._credit_points(session, [9800], 20, "opening")
+        session.commit()
+    reward = db.add_reward("Catalog cap", "test", 15)
+    cached = load_catalog().rewards[reward.id]
+    assert db.redeem_reward(9800, reward.id, cached) is cached
+    assert db.get_or_create_user(9800).points == 5
+    assert db.redeem_reward(9800, 10**9) is None  # unknown reward
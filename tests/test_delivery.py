@@ -0,0 +1,112 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import asyncio
+import time
+
+from aiogram.exceptions import (
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
+from aiogram.methods import SendMessage
+
+from bot import delivery as delivery_module
+from bot.delivery import DeliveryQueue, TokenBucket
+
+METHOD = SendMessage(chat_id=1, text="x")
+
+
+class FakeBot:
+    def __init__(self, failures=None):
+        self.sent = []
+        self.failures = failures or {}  # text -> exceptions raised in turn
+
+    async def send_message(self, chat_id, text, **kwargs):
+        errors = self.failures.get(text)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append((chat_id, text, time.monotonic()))
+
+
+def run(scenario, bot, **options):
+    async def go():
+        queue = DeliveryQueue(bot, **options)
+        queue.start()
+        try:
+            return await scenario(queue)
+        finally:
+            await queue.stop(1.0)
+
+    return asyncio.run(go())
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=10, capacity=1)
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert 0.05 < bucket.delay() <= 0.1
+    bucket.pause(5)
+    assert bucket.delay() > 4.9
+
+
+def test_busy_chat_does_not_hold_up_other_chats(monkeypatch):
+    monkeypatch.setattr(delivery_module, 'PRIVATE_CHAT_RATE', 20)
+    bot = FakeBot()
+
+    async def scenario(queue):
+        start = time.monotonic()
+        busy = [queue.submit(1, f"busy {i}") for i in range(10)]
+        others = [queue.submit(chat_id, "hi") for chat_id in range(2, 12)]
+        assert all(await asyncio.gather(*others))
+        others_done = time.monotonic() - start
+        assert all(await asyncio.gather(*busy))
+        return others_done, time.monotonic() - start
+
+    others_done, all_done = run(scenario, bot, workers=4, global_rate=1000)
+    # chat 1 sends one message every 50ms, the other chats do not wait for it
+    assert others_done < 0.15 < all_done
+    assert [text for chat_id, text, _ in bot.sent if chat_id == 1] == [
+        f"busy {i}" for i in range(10)
+    ]
+
+
+def test_retries_and_drops(monkeypatch):
+    monkeypatch.setattr(delivery_module, 'BACKOFF_BASE', 0.01)
+    monkeypatch.setattr(delivery_module, 'PRIVATE_CHAT_RATE', 100)
+    bot = FakeBot(
+        {
+            "flood": [TelegramRetryAfter(METHOD, "flood", 0)],
+            "flaky": [TelegramNetworkError(METHOD, "reset")] * 2,
+            "down": [TelegramNetworkError(METHOD, "reset")] * 5,
+            "blocked": [TelegramForbiddenError(METHOD, "blocked")],
+        }
+    )
+
+    async def scenario(queue):
+        return await queue.deliver_many(
+            (text, chat_id, text)
+            for chat_id, text in enumerate(["flood", "flaky", "down", "blocked"], start=1)
+        )
+
+    report = run(scenario, bot, max_attempts=3)
+    assert report.delivered == ["flood", "flaky"]
+    assert report.rejected == ["blocked"]  # "down" may be retried later
+    assert bot.failures["down"] == [bot.failures["down"][0]] * 2
+
+
+def test_stop_gives_up_on_backlog_after_timeout(monkeypatch):
+    monkeypatch.setattr(delivery_module, 'PRIVATE_CHAT_RATE', 1)
+
+    async def go():
+        queue = DeliveryQueue(FakeBot(), workers=2, global_rate=1000)
+        queue.start()
+        futures = [queue.submit(1, f"m{i}") for i in range(5)]
+        start = time.monotonic()
+        await queue.stop(0.1)
+        assert time.monotonic() - start < 0.5
+        return [f.result() for f in futures]
+
+    assert asyncio.run(go()) == [True, False, False, False, False]
@@ -0,0 +1,99 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from bot import database as db
+from bot import main as main_module
+from bot.delivery import DeliveryReport
+from bot.expiry import ExpiryEngine
+
+
+def make_engine(calls, window=timedelta(hours=24)):
+    async def on_expire():
+        calls.append("expire")
+
+    async def on_warn():
+        calls.append("warn")
+
+    return ExpiryEngine(on_expire=on_expire, on_warn=on_warn, warning_window=window)
+
+
+def test_identical_deadlines_share_heap_entries():
+    engine = make_engine([])
+    expires_at = datetime.utcnow() + timedelta(days=3)
+    engine.schedule_many([expires_at] * 1000)
+    assert len(engine) == 2  # one warning and one expiry
+    engine.schedule(expires_at + timedelta(seconds=1))
+    assert len(engine) == 4
+    engine.clear()
+    assert len(engine) == 0
+
+
+def test_expire_fires_before_warn_when_both_are_due():
+    calls = []
+    engine = make_engine(calls, window=timedelta(0))
+
+    async def go():
+        engine.schedule(datetime.utcnow() - timedelta(seconds=1))
+        task = asyncio.create_task(engine.run())
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(go())
+    assert calls == ["expire", "warn"]
+    assert len(engine) == 0
+
+
+def test_earlier_deadline_wakes_the_sleeping_loop():
+    calls = []
+    engine = make_engine(calls, window=timedelta(hours=1))
+
+    async def go():
+        engine.schedule(datetime.utcnow() + timedelta(days=1))
+        task = asyncio.create_task(engine.run())
+        await asyncio.sleep(0.01)
+        assert calls == []
+        # scheduled from a run_db thread: warning due now, expiry in 50ms
+        soon = datetime.utcnow() + timedelta(milliseconds=50)
+        await asyncio.to_thread(engine.schedule, soon)
+        await asyncio.sleep(0.02)
+        assert calls == ["warn"]
+        await asyncio.sleep(0.1)
+        assert calls == ["warn", "expire"]
+        task.cancel()
+
+    asyncio.run(go())
+    assert len(engine) == 2  # the deadlines of the first mission remain
+
+
+def test_warnings_rejected_by_telegram_are_not_retried(monkeypatch):
+    missions = [db.assign_mission(user_id, "Expiring soon", 1) for user_id in (9850, 9851, 9852)]
+    delivered, blocked, flaky = (m.id for m in missions)
+    with db.get_session() as session:
+        session.execute(
+            update(db.Mission)
+            .where(db.Mission.id.in_([delivered, blocked, flaky]))
+            .values(expires_at=datetime.utcnow() + timedelta(hours=1))
+        )
+        session.commit()
+
+    class FakeDelivery:
+        async def deliver_many(self, messages):
+            keys = [key for key, _, _ in messages]
+            return DeliveryReport(
+                delivered=[k for k in keys if k != blocked and k != flaky],
+                rejected=[k for k in keys if k == blocked],
+            )
+
+    monkeypatch.setattr(main_module, 'delivery', FakeDelivery())
+    asyncio.run(main_module.send_expiry_warnings())
+    pending = {m.id for m in db.get_missions_near_expiry(24)}
+    assert delivered not in pending
+    assert blocked not in pending
+    assert flaky in pending
@@ -0,0 +1,51 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import os
+import subprocess
+
+import pytest
+
+# Self time of the bot's own modules, excluding aiogram/SQLAlchemy/etc.
+OWN_IMPORT_BUDGET = 0.5  # seconds
+
+
+def import_times(module, workdir):
+    """Import ``module`` in a fresh interpreter and return ``{name: self seconds}``."""
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(ROOT_DIR),
+        DATABASE_URL=f"sqlite:///{workdir}/import.db",
+        BOT_TOKEN="",
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=workdir,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        if self_us.isdigit():
+            times[name] = int(self_us) / 1_000_000
+    return times
+
+
+@pytest.mark.parametrize("module", ["bot.database", "bot.main"])
+def test_import_is_fast_and_side_effect_free(module, tmp_path):
+    times = import_times(module, tmp_path)
+    own = sum(t for name, t in times.items() if name == "bot" or name.startswith("bot."))
+    assert own < OWN_IMPORT_BUDGET, sorted(times.items(), key=lambda item: -item[1])[:10]
+    # no engine, tables or database file until init_db() is called
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_database_does_not_import_aiogram(tmp_path):
+    assert not any(name.startswith("aiogram") for name in import_times("bot.database", tmp_path))
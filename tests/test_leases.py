@@ -0,0 +1,116 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from bot import database as db
+from bot import leases as leases_module
+from bot import main as main_module
+from bot.database import expiry_listeners
+from bot.delivery import DeliveryReport
+from bot.leases import LeaderLease
+
+
+def test_job_runs_only_on_lease_holder(monkeypatch):
+    holders = {}
+
+    def fake_acquire(name, holder, ttl):
+        return holders.setdefault(name, holder) == holder
+
+    def fake_release(name, holder):
+        if holders.get(name) == holder:
+            del holders[name]
+
+    monkeypatch.setattr(leases_module, 'acquire_lease', fake_acquire)
+    monkeypatch.setattr(leases_module, 'release_lease', fake_release)
+
+    runs = []
+
+    def job_for(worker):
+        async def job():
+            runs.append(worker)
+            await asyncio.Event().wait()
+        return job
+
+    async def go():
+        first = LeaderLease("jobs", "a", ttl=0.03)
+        second = LeaderLease("jobs", "b", ttl=0.03)
+        task_a = asyncio.create_task(first.run(job_for("a")))
+        task_b = asyncio.create_task(second.run(job_for("b")))
+        await asyncio.sleep(0.05)
+        assert (first.leader, second.leader) == (True, False)
+        # the leader goes away and releases its lease; the other takes over
+        task_a.cancel()
+        await asyncio.gather(task_a, return_exceptions=True)
+        await asyncio.sleep(0.05)
+        assert second.leader
+        task_b.cancel()
+        await asyncio.gather(task_b, return_exceptions=True)
+
+    asyncio.run(go())
+    assert runs == ["a", "b"]
+    assert holders == {}
+
+
+def test_only_the_leader_arms_expiries(monkeypatch):
+    monkeypatch.setattr(main_module, 'get_mission_expiries', lambda until=None: [])
+    expiry = main_module.expiry
+
+    async def go():
+        assert expiry.schedule not in expiry_listeners
+        task = asyncio.create_task(main_module.run_expiry_engine())
+        await asyncio.sleep(0.01)
+        assert expiry.schedule in expiry_listeners
+        expiry.schedule(datetime.utcnow() + timedelta(days=2))
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(go())
+    assert expiry.schedule not in expiry_listeners
+    assert len(expiry) == 0
+
+
+class FakeDelivery:
+    def submit(self, chat_id, text):
+        pass
+
+    async def deliver_many(self, messages):
+        return DeliveryReport(delivered=[key for key, _, _ in messages])
+
+
+def test_new_leader_pays_every_missed_week_once(monkeypatch):
+    this_week = main_module._week_start(datetime.utcnow().date())
+    weeks = [this_week - timedelta(days=14), this_week - timedelta(days=7)]
+    for user_id in (9500, 9501):
+        db.get_or_create_user(user_id)
+    with db.get_session() as session:
+        for user_id, week in zip((9500, 9501), weeks):
+            session.execute(
+                insert(db.WeeklyActivity).values(
+                    user_id=user_id,
+                    week_start=datetime.combine(week, datetime.min.time()),
+                    message_count=5,
+                )
+            )
+        session.commit()
+    db.set_job_period("weekly_summary", weeks[0])
+
+    async def stop(seconds):
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(main_module, 'delivery', FakeDelivery())
+    monkeypatch.setattr(main_module.asyncio, 'sleep', stop)
+
+    async def go():
+        await asyncio.gather(main_module.weekly_summary_scheduler(), return_exceptions=True)
+        # a retry of an already closed week, e.g. after a lost lease
+        return await main_module.close_week(weeks[0])
+
+    assert asyncio.run(go()) == 0
+    assert db.get_job_period("weekly_summary") == this_week
+    assert [db.get_or_create_user(uid).points for uid in (9500, 9501)] == [10, 10]
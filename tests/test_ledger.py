@@ -0,0 +1,46 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from sqlalchemy import update
+
+from bot import database as db
+
+
+def make_user(user_id, points):
+    db.get_or_create_user(user_id)
+    with db.get_session() as session:
+        db._credit_points(session, [user_id], points, "opening")
+        session.commit()
+
+
+def test_debit_requires_enough_points_and_ledger_follows_balance():
+    make_user(9200, 30)
+    reward = db.add_reward("Ledger cap", "test", 25)
+    assert db.redeem_reward(9200, reward.id) is not None
+    assert db.redeem_reward(9200, reward.id) is None  # 5 points left
+
+    entries = db.get_points_ledger(9200)
+    assert [(e.delta, e.balance, e.reason) for e in entries] == [
+        (30, 30, "opening"),
+        (-25, 5, "purchase"),
+    ]
+    assert db.get_or_create_user(9200).points == 5
+    assert all(row[0] != 9200 for row in db.audit_points())
+
+
+def test_audit_finds_and_rebuild_fixes_drifted_balances():
+    make_user(9201, 40)
+    make_user(9202, 7)
+    with db.get_session() as session:
+        session.execute(update(db.User).where(db.User.id == 9201).values(points=999))
+        session.commit()
+    db.user_cache.discard(9201)
+
+    drifted = [row for row in db.audit_points() if row[0] in (9201, 9202)]
+    assert drifted == [(9201, 999, 40)]
+    fixed = [row for row in db.rebuild_points() if row[0] in (9201, 9202)]
+    assert fixed == [(9201, 40, 1)]
+    assert db.get_or_create_user(9201).points == 40
+    assert not [row for row in db.audit_points() if row[0] in (9201, 9202)]
@@ -0,0 +1,73 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from bot import metrics
+
+
+def test_handler_latency_errors_and_queries_are_recorded():
+    engine = create_engine("sqlite://")
+
+    async def cmd_metrics_ok(event, data):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+
+    async def cmd_metrics_fail(event, data):
+        raise RuntimeError("boom")
+
+    middleware = metrics.MetricsMiddleware()
+
+    def call(func):
+        data = {"handler": SimpleNamespace(callback=func)}
+        return asyncio.run(middleware(func, None, data))
+
+    call(cmd_metrics_ok)
+    with pytest.raises(RuntimeError):
+        call(cmd_metrics_fail)
+
+    assert metrics.handler_seconds.count("cmd_metrics_ok") == 1
+    assert metrics.handler_errors.value("cmd_metrics_fail") == 1
+    assert metrics.handler_errors.value("cmd_metrics_ok") == 0
+    assert metrics.db_queries.value("cmd_metrics_ok") == 2
+
+    with metrics.job("test_job") as iteration:
+        iteration.items = 7
+    assert metrics.job_items.value("test_job") == 7
+
+    body = metrics.render()
+    assert "# TYPE bot_handler_seconds histogram" in body
+    assert 'bot_handler_seconds_count{handler="cmd_metrics_ok"} 1' in body
+    assert 'bot_handler_seconds_bucket{handler="cmd_metrics_ok",le="+Inf"} 1' in body
+    assert 'bot_db_queries_total{operation="cmd_metrics_ok"} 2.0' in body
+
+
+def test_expiry_engine_callbacks_are_timed_as_jobs(monkeypatch):
+    from bot import main as main_module
+
+    async def expired():
+        return 2
+
+    async def warned():
+        return 3
+
+    monkeypatch.setattr(main_module, 'expire_missions', expired)
+    monkeypatch.setattr(main_module, 'send_expiry_warnings', warned)
+    before = metrics.job_seconds.count("expire_missions"), metrics.job_seconds.count("expiry_warnings")
+
+    async def fire():
+        await main_module.expiry.on_expire()
+        await main_module.expiry.on_warn()
+
+    asyncio.run(fire())
+    assert metrics.job_seconds.count("expire_missions") == before[0] + 1
+    assert metrics.job_seconds.count("expiry_warnings") == before[1] + 1
+    assert metrics.job_items.value("expire_missions") >= 2
+    assert metrics.job_items.value("expiry_warnings") >= 3
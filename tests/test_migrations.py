@@ -0,0 +1,73 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import sqlite3
+
+from sqlalchemy import create_engine, inspect, text
+from sqlmodel import SQLModel
+
+from bot import database  # noqa: F401  registers the models
+from bot.migrations import MIGRATIONS, run_migrations
+
+FIXTURE = ROOT_DIR / "tests" / "fixtures" / "baseline.sql"
+
+
+def schema(engine):
+    inspector = inspect(engine)
+    return {
+        table: (
+            sorted(column["name"] for column in inspector.get_columns(table)),
+            sorted(
+                (index["name"], tuple(index["column_names"]), bool(index["unique"]))
+                for index in inspector.get_indexes(table)
+            ),
+        )
+        for table in inspector.get_table_names()
+    }
+
+
+def test_baseline_database_is_upgraded(tmp_path):
+    path = tmp_path / "baseline.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(FIXTURE.read_text())
+    engine = create_engine(f"sqlite:///{path}")
+    fresh = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+
+    applied = run_migrations(engine, SQLModel.metadata)
+    assert applied == [version for version, _, _ in MIGRATIONS]
+    assert run_migrations(fresh, SQLModel.metadata) == []
+    assert schema(engine) == schema(fresh)
+    # a second start finds nothing to do
+    assert run_migrations(engine, SQLModel.metadata) == []
+
+    with engine.connect() as conn:
+        def rows(sql):
+            return [tuple(row) for row in conn.execute(text(sql))]
+
+        assert rows("SELECT user_id, message_count FROM weeklyactivity ORDER BY user_id") == [
+            (1, 5),
+            (2, 4),
+        ]
+        assert rows("SELECT user_id, delta, reason FROM pointsledger") == [(1, 120, "opening")]
+        assert rows('SELECT id, badge_count FROM "user" ORDER BY id') == [(1, 1), (2, 0)]
+        assert rows("SELECT month, purchases FROM monthlypurchaserollup ORDER BY month") == [
+            ("2024-01-01 00:00:00.000000", 2),
+            ("2024-02-01 00:00:00.000000", 1),
+        ]
+        # the two users share one template; reward follows calculate_reward()
+        assert rows(
+            "SELECT m.id, m.user_id, t.description, t.type, t.goal, t.reward,"
+            " m.progress, m.expires_at, m.warning_sent"
+            " FROM mission AS m JOIN missiontemplate AS t ON t.id = m.template_id"
+            " ORDER BY m.id"
+        ) == [
+            (1, 1, "Envia 3 mensajes", "daily", 3, 15, 1, "2024-01-16 00:00:00.000000", 0),
+            (2, 2, "Envia 3 mensajes", "daily", 3, 15, 0, "2024-01-16 00:00:00.000000", 1),
+            (3, 1, "Reto dificil", "hard", 2, 16, 0, None, 0),
+            (4, None, "Global", "generic", 1, 1, 0, None, 0),
+        ]
+        assert rows("SELECT COUNT(*) FROM missiontemplate") == [(3,)]
+    engine.dispose()
+    fresh.dispose()
@@ -0,0 +1,96 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import asyncio
+import io
+from types import SimpleNamespace
+
+from bot import admin as admin_module
+from bot.admin import import_missions_command
+from bot.admin.importer import read_mission_rows
+
+from test_admin_commands import FakeUser
+
+
+class FakeStatus:
+    def __init__(self, text):
+        self.texts = [text]
+
+    async def edit_text(self, text):
+        self.texts.append(text)
+
+
+class FakeBot:
+    def __init__(self, payload):
+        self.payload = payload
+
+    async def download(self, document, destination):
+        destination.write(self.payload)
+
+
+class FakeDocumentMessage:
+    def __init__(self, payload, user_id=1):
+        self.text = None
+        self.caption = "/importmissions"
+        self.from_user = FakeUser(user_id)
+        self.document = SimpleNamespace(file_id="doc")
+        self.bot = FakeBot(payload)
+        self.status = None
+
+    async def answer(self, text):
+        self.status = FakeStatus(text)
+        return self.status
+
+
+def test_rows_are_parsed_and_validated():
+    data = "user_id\tdescription\tpoints\tdays\ttype\tgoal\n1\tSaluda\t5\t2\tdaily\t3\n\nx\tMal\t1\t1\n2\tSin fin\t4\t\n"
+    rows = list(read_mission_rows(io.StringIO(data)))
+    assert [line for line, _ in rows] == [2, 4, 5]
+    assert rows[0][1]["goal"] == 3 and rows[0][1]["type"] == "daily"
+    assert isinstance(rows[1][1], str)
+    assert rows[2][1]["expires_at"] is None and rows[2][1]["goal"] == 1
+
+
+def test_import_command_batches_and_reports(monkeypatch):
+    batches = []
+
+    def fake_import(rows):
+        batches.append(len(rows))
+        return len(rows)
+
+    monkeypatch.setattr(admin_module, 'import_missions', fake_import)
+    monkeypatch.setattr(admin_module, 'IMPORT_BATCH_SIZE', 2)
+    lines = [f"{uid},Mision {uid},3,1" for uid in range(1, 6)] + ["7,,3,1"]
+    msg = FakeDocumentMessage("\n".join(lines).encode())
+    asyncio.run(import_missions_command(msg))
+
+    assert batches == [2, 2, 1]
+    assert msg.status.texts[-1].startswith(
+        "Importaci\u00f3n terminada: 5 misiones creadas, 1 filas con errores"
+    )
+    assert "L\u00ednea 6" in msg.status.texts[-1]
+
+
+def test_out_of_range_values_are_row_errors():
+    data = f"1,x,5,99999999\n1,x,5,9999999999\n1,x,{10**20},1\n1,x,5,1,generic,{10**19}\n{10**20},x,5,1\n1,x,5,1\n"
+    rows = list(read_mission_rows(io.StringIO(data)))
+    assert [isinstance(row, str) for _, row in rows] == [True] * 5 + [False]
+
+
+def test_failed_batch_is_reported(monkeypatch):
+    def fake_import(rows):
+        if rows[0]["user_id"] == 3:
+            raise OverflowError("Python int too large to convert to SQLite INTEGER")
+        return len(rows)
+
+    monkeypatch.setattr(admin_module, 'import_missions', fake_import)
+    monkeypatch.setattr(admin_module, 'IMPORT_BATCH_SIZE', 2)
+    lines = [f"{uid},Mision {uid},3,1" for uid in range(1, 6)]
+    msg = FakeDocumentMessage("\n".join(lines).encode())
+    asyncio.run(import_missions_command(msg))
+
+    final = msg.status.texts[-1]
+    assert final.startswith("Importaci\u00f3n terminada: 3 misiones creadas, 2 filas con errores")
+    assert "Lote de 2 filas hasta la l\u00ednea 4" in final
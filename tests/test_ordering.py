@@ -0,0 +1,47 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import asyncio
+from types import SimpleNamespace
+
+from bot.ordering import UserOrderingMiddleware
+
+
+def test_same_user_in_order_other_users_in_parallel():
+    middleware = UserOrderingMiddleware(limit=2)
+    log = []
+    running = {"now": 0, "peak": 0}
+
+    async def handler(event, data):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        log.append(("start", event))
+        await asyncio.sleep(0.01)
+        log.append(("end", event))
+        running["now"] -= 1
+
+    async def go():
+        updates = [(1, "a1"), (1, "a2"), (1, "a3"), (2, "b1"), (3, "c1"), (3, "c2")]
+        tasks = [
+            asyncio.create_task(
+                middleware(handler, event, {"event_from_user": SimpleNamespace(id=uid)})
+            )
+            for uid, event in updates
+        ]
+        await asyncio.sleep(0)
+        stats = middleware.stats()
+        assert stats["users"] == 3
+        assert stats["deepest"][0] == (1, 3)
+        assert stats["running"] + stats["queued"] == len(updates)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(go())
+    for user_events in (["a1", "a2", "a3"], ["c1", "c2"]):
+        order = [(kind, e) for kind, e in log if e in user_events]
+        # each update finishes before the same user's next one starts
+        assert order == [(kind, e) for e in user_events for kind in ("start", "end")]
+    assert running["peak"] == 2
+    assert middleware.stats()["users"] == 0
+    assert middleware.handled == 6
@@ -0,0 +1,55 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from bot import database as db
+
+
+def cursor(entry):
+    return entry.purchased_at, entry.id
+
+
+def test_pages_walk_both_ways_across_tied_timestamps():
+    db.get_or_create_user(9400)
+    reward = db.add_reward("Paging", "test", 1)
+    tie = datetime(2024, 3, 1, 12, 0)
+    times = [datetime(2024, 1, 1), tie, tie, tie, tie, datetime(2024, 4, 1), datetime(2024, 5, 1)]
+    with db.get_session() as session:
+        ids = [
+            session.execute(
+                insert(db.Purchase)
+                .values(user_id=9400, reward_id=reward.id, purchased_at=when)
+                .returning(db.Purchase.id)
+            ).scalar()
+            for when in times
+        ]
+        session.commit()
+    newest_first = ids[::-1]
+
+    pages = [db.get_purchase_page(9400, limit=3)]
+    while pages[-1].has_older:
+        pages.append(db.get_purchase_page(9400, before=cursor(pages[-1].entries[-1]), limit=3))
+    assert [[e.id for e in page.entries] for page in pages] == [
+        newest_first[0:3],
+        newest_first[3:6],
+        newest_first[6:],
+    ]
+    assert [(page.has_newer, page.has_older) for page in pages] == [
+        (False, True),
+        (True, True),
+        (True, False),
+    ]
+    assert pages[0].entries[0].reward_name == "Paging"
+
+    # walking back to newer pages returns the same pages, ties included
+    back = db.get_purchase_page(9400, after=cursor(pages[2].entries[0]), limit=3)
+    assert [e.id for e in back.entries] == newest_first[3:6]
+    assert (back.has_newer, back.has_older) == (True, True)
+    first = db.get_purchase_page(9400, after=cursor(back.entries[0]), limit=3)
+    assert [e.id for e in first.entries] == newest_first[0:3]
+    assert (first.has_newer, first.has_older) == (False, True)
@@ -0,0 +1,101 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import asyncio
+from datetime import datetime
+
+from bot import database as db
+from bot.admin import create_mission
+from bot.querylog import count_queries, normalize
+
+from test_admin_commands import FakeMessage
+
+
+def make_users(first, count):
+    for user_id in range(first, first + count):
+        db.get_or_create_user(user_id)
+    return list(range(first, first + count))
+
+
+def test_normalize_groups_literals_and_in_lists():
+    assert normalize("SELECT * FROM t WHERE id IN (?, ?, ?)  AND x = 5") == (
+        "SELECT * FROM t WHERE id IN (?...) AND x = ?"
+    )
+
+
+def test_user_snapshot(max_queries):
+    make_users(5000, 1)
+    db.user_cache.clear()
+    with max_queries(3):
+        db.get_user_snapshot(5000)
+    with max_queries(2):
+        db.get_user_snapshot(5000)
+
+
+def test_bulk_assignment_does_not_grow_with_users(max_queries):
+    make_users(6000, 50)
+    # one upsert for the new template, then the same two statements as before
+    with max_queries(3):
+        db.assign_daily_missions("pinned daily", 1, goal=1)
+    with max_queries(3):
+        db.assign_weekly_missions("pinned weekly", 1, goal=1)
+
+
+def test_warnings_are_marked_in_chunks(max_queries):
+    with max_queries(3):
+        db.mark_warnings_sent(list(range(1, 1201)))
+
+
+def test_weekly_bonus_does_not_grow_with_winners():
+    users = make_users(7000, 12)
+    for user_id in users:
+        for _ in range(user_id - 6990):
+            db.record_user_message(user_id)
+    db.flush_activity_buffer()
+    week = datetime.utcnow().date()
+    with count_queries() as few:
+        db.reward_top_weekly_users(week, top_n=2)
+    with count_queries() as many:
+        db.reward_top_weekly_users(week, top_n=10)
+    assert many.count == few.count, many.report()
+
+
+def test_createmission_handler(max_queries):
+    msg = FakeMessage("/createmission 8000|Pinned|3|1")
+    with max_queries(2):
+        asyncio.run(create_mission(msg))
+    assert msg.responses == ["Misi\u00f3n creada"]
+
+
+def test_missions_share_cached_templates(max_queries):
+    first, second = make_users(9000, 2)
+    db.assign_mission(first, "Shared", 4, goal=2)
+    with max_queries(1):
+        mission = db.assign_mission(second, "Shared", 4, goal=2)
+    assert mission.reward == 8 and mission.goal == 2
+    views = db.get_active_missions(first) + db.get_active_missions(second)
+    assert {view.description for view in views} == {"Shared"}
+
+
+def test_import_resolves_templates_in_bulk(max_queries):
+    make_users(9600, 1)
+    rows = [
+        {
+            "user_id": 9600,
+            "description": f"Personal {i}",
+            "points": 2,
+            "type": "generic",
+            "goal": 1,
+            "expires_at": None,
+        }
+        for i in range(1000)
+    ]
+    # two chunked template upserts and one mission executemany
+    with max_queries(3):
+        assert db.import_missions(rows) == 1000
+    with max_queries(1):
+        db.import_missions(rows[:10])
+    views = db.get_active_missions(9600)
+    assert len(views) == 1010 and {v.reward for v in views} == {2}
@@ -0,0 +1,57 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import random
+
+from bot.ranking import RankingIndex
+
+
+def expected_order(points):
+    return sorted(points.items(), key=lambda item: (-item[1], item[0]))
+
+
+def test_top_and_rank_follow_updates():
+    rng = random.Random(7)
+    points = {uid: rng.randint(0, 50) for uid in range(1, 200)}
+    index = RankingIndex()
+    index.load(points.items())
+
+    for _ in range(500):
+        uid = rng.randint(1, 250)
+        points[uid] = rng.randint(0, 50)
+        index.update(uid, points[uid])
+    for uid in (3, 17, 240):
+        points.pop(uid, None)
+        index.remove(uid)
+
+    assert index.top(10) == expected_order(points)[:10]
+    assert len(index) == len(points)
+    for uid, value in points.items():
+        ahead = sum(1 for other in points.values() if other > value)
+        assert index.rank(uid) == (ahead + 1, len(points))
+
+
+def test_rank_unknown_user():
+    index = RankingIndex()
+    assert index.top(5) == []
+    assert index.rank(1) is None
+    index.update(1, 10)
+    index.update(2, 10)
+    assert index.rank(2) == (1, 2)
+    assert index.top(5) == [(1, 10), (2, 10)]
+
+
+def test_reload_keeps_updates_made_while_reading():
+    index = RankingIndex()
+    index.load([(1, 10), (2, 20)])
+    index.track_updates()
+    snapshot = [(1, 10), (2, 20), (3, 5)]  # read before the updates below
+    index.update(1, 50)
+    index.remove(2)
+    index.load(snapshot)
+    assert index.top(5) == [(1, 50), (3, 5)]
+    index.update(3, 60)
+    index.load([(1, 50), (3, 5)])
+    assert index.top(5) == [(1, 50), (3, 5)]
@@ -0,0 +1,47 @@
+import sys, pathlib
+from datetime import datetime
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from sqlalchemy import delete
+
+from bot import database as db
+
+
+def _count(month, reward_id):
+    summary = db.get_monthly_purchase_summary(month)
+    return {reward.id: count for reward, count in summary if reward}.get(reward_id, 0)
+
+
+def test_rebuild_restores_wiped_rollups():
+    db.get_or_create_user(9900)
+    with db.get_session() as session:
+        db._credit_points(session, [9900], 10, "opening")
+        session.commit()
+    reward = db.add_reward("Rollup pin", "test", 3)
+    assert db.redeem_reward(9900, reward.id)
+    assert db.redeem_reward(9900, reward.id)
+    # an older purchase only the rebuild knows about
+    march = datetime(2020, 3, 15)
+    with db.get_session() as session:
+        session.add(db.Purchase(user_id=9900, reward_id=reward.id, purchased_at=march))
+        session.commit()
+
+    now = datetime.utcnow()
+    assert _count(now, reward.id) == 2
+    assert _count(march, reward.id) == 0
+
+    with db.get_session() as session:
+        session.execute(delete(db.MonthlyPurchaseRollup))
+        session.commit()
+    assert _count(now, reward.id) == 0
+
+    assert db.rebuild_monthly_rollups(now.date()) == 1
+    assert _count(now, reward.id) == 2
+    assert _count(march, reward.id) == 0
+
+    assert db.rebuild_monthly_rollups() >= 2
+    assert _count(now, reward.id) == 2
+    assert _count(march, reward.id) == 1
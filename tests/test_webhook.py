@@ -0,0 +1,98 @@
+import sys, pathlib
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+
+from bot.ordering import UserOrderingMiddleware
+from bot.webhook import SECRET_HEADER, WebhookServer
+
+
+def make_update(update_id, text, user_id=42):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+def run_server(scenario, **options):
+    received = []
+    dp = Dispatcher()
+    dp.update.outer_middleware(UserOrderingMiddleware())
+
+    @dp.message()
+    async def collect(message: Message):
+        await asyncio.sleep(0.01)
+        received.append(message.text)
+
+    async def go():
+        bot = Bot(token="123456:TEST")
+        server = WebhookServer(dp, bot, **options)
+        async with TestClient(TestServer(server.app())) as client:
+            await scenario(client, server)
+        await bot.session.close()
+
+    asyncio.run(go())
+    return received
+
+
+def test_posted_updates_reach_dispatcher():
+    async def scenario(client, server):
+        for i in range(5):
+            resp = await client.post("/webhook", json=make_update(i, f"msg {i}"))
+            assert resp.status == 200
+        health = await client.get("/healthz")
+        assert (await health.json())["received"] == 5
+        await server.drain()
+        health = await client.get("/healthz")
+        assert health.status == 503
+        resp = await client.post("/webhook", json=make_update(9, "late"))
+        assert resp.status == 503
+
+    received = run_server(scenario, max_in_flight=2)
+    assert sorted(received) == [f"msg {i}" for i in range(5)]
+
+
+def test_secret_token_and_bad_payload():
+    async def scenario(client, server):
+        resp = await client.post("/webhook", json=make_update(1, "hi"))
+        assert resp.status == 401
+        headers = {SECRET_HEADER: "s3cret"}
+        resp = await client.post("/webhook", json={"nope": 1}, headers=headers)
+        assert resp.status == 400
+        resp = await client.post("/webhook", json=make_update(2, "ok"), headers=headers)
+        assert resp.status == 200
+        await server.drain()
+
+    assert run_server(scenario, secret_token="s3cret") == ["ok"]
+
+
+def test_busy_user_cannot_take_every_slot():
+    async def scenario(client, server):
+        busy = [
+            asyncio.create_task(client.post("/webhook", json=make_update(i, f"busy {i}", 1)))
+            for i in range(8)
+        ]
+        await asyncio.sleep(0.005)
+        resp = await asyncio.wait_for(
+            client.post("/webhook", json=make_update(100, "other", 2)), 0.05
+        )
+        assert resp.status == 200
+        await asyncio.gather(*busy)
+        await server.drain()
+
+    received = run_server(scenario, max_in_flight=4, max_per_user=2)
+    assert len(received) == 9
+    # user 2 is handled alongside user 1's first updates, not after all of them
+    assert received.index("other") < 3